@@ -0,0 +1,205 @@
+import argparse
+import datetime
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+from detection import make_detector, CascadeDetector
+from event_store import EventStore
+from frame_analyzer import FrameAnalyzer
+from frame_pool import FramePool
+from incidents import IncidentEngine
+from inference_backend import backends, export_model, exported_path, load_backend
+from report import create_pdf
+
+video_extensions = (".mp4", ".avi", ".mov", ".mkv")  # Recorded session formats picked up from directories
+model_path = 'yolov8m.pt'  # Same model as the live scripts
+detector = None  # Loaded once per worker process by init_worker()
+
+
+def find_videos(paths):
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(video_extensions):
+                    videos.append(os.path.join(path, name))
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            print(f"Skipping missing input: {path}")
+    return videos
+
+
+def init_worker(weights, torch_threads, backend="pytorch", int8=False, two_stage=False, fast_weights=None):
+    global detector
+    # Each worker owns its model; limit torch threads so workers don't oversubscribe the cores
+    import torch
+    torch.set_num_threads(torch_threads)
+    model = load_backend(backend, weights, int8=int8)
+    detector = make_detector(model, two_stage)
+    if fast_weights:
+        detector = CascadeDetector(make_detector(load_backend(backend, fast_weights, int8=int8), two_stage), detector)
+
+
+def process_video(video_path, output_dir):
+    # Runs the same per-frame labelling and incident logging as detect_phone_and_humans(),
+    # timing incidents by their position in the clip rather than the wall clock
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    video_output_dir = os.path.join(output_dir, name)
+    snapshot_dir = os.path.join(video_output_dir, "snapshots")
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return {"video": video_path, "error": "failed to open video"}
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    # The recording is assumed to end at the file's modification time
+    clip_seconds = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    recording_start = datetime.datetime.fromtimestamp(os.path.getmtime(video_path)) - datetime.timedelta(seconds=clip_seconds)
+
+    def save_incident_frame(incident, frame, role):
+        image_path = os.path.join(snapshot_dir, f"{role}_{incident.incident_id}.png")
+        return [image_path] if cv2.imwrite(image_path, frame) else []
+
+    frame_pool = FramePool()  # Frames are decoded into recycled buffers
+    incident_engine = IncidentEngine(save_incident_frame, frame_pool=frame_pool)
+    event_store = EventStore(os.path.join(video_output_dir, "events.db"))
+    session = f"{name}@{datetime.datetime.now():%Y-%m-%d_%H-%M-%S}"  # Re-runs append a new session
+    frame_index = 0
+    frame_analyzer = FrameAnalyzer()  # Recorded sessions are mostly static, unchanged frames skip the model
+    start = time.perf_counter()
+
+    frame_shape = None
+    while True:
+        buffer = frame_pool.acquire(frame_shape, stage="decode") if frame_shape else None
+        ret, frame = cap.read(buffer)
+        if not ret:
+            frame_pool.release(buffer)
+            break
+        if frame is not buffer:
+            frame_pool.release(buffer)
+            frame_pool.adopt(frame, stage="decode")
+            frame_shape = frame.shape
+
+        frame_time = recording_start + datetime.timedelta(seconds=frame_index / fps)
+        frame_index += 1
+
+        phones, confirmed_tracks, signals, boxes = frame_analyzer.step(frame, lambda frame: detector(frame, verbose=False))
+        for x1, y1, x2, y2, conf, _ in phones.tolist():
+            color = (0, 255, 0)  # Green for cell phones
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, f'cell phone {conf:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        frame_height, frame_width = frame.shape[:2]
+        for track in frame_analyzer.person_tracker.visible_tracks():
+            x1, y1, x2, y2 = track.clipped_box(frame_width, frame_height)
+            color = (255, 0, 0)  # Blue for humans
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, f'Person {track.track_id} {track.confidence:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        for incident in incident_engine.update(frame_time, signals, frame, boxes):
+            event_store.record_incident(session, incident)
+        frame_pool.release(frame)
+
+    cap.release()
+    for incident in incident_engine.close_all():
+        event_store.record_incident(session, incident)
+    elapsed = time.perf_counter() - start
+
+    events = event_store.query(session=session)
+    event_store.close()
+    pdf_path = create_pdf(events, os.path.join(video_output_dir, "detection_log.pdf"))
+    return {
+        "video": video_path,
+        "frames": frame_index,
+        "seconds": elapsed,
+        "events": len(events),
+        "pdf": pdf_path,
+        "skip_ratio": frame_analyzer.motion_gate.stats()["skip_ratio"],
+        "frames_allocated": sum(frame_pool.stats()["allocated"].values()),
+    }
+
+
+def run_batch(videos, output_dir, workers=None, weights=model_path, backend="pytorch", int8=False, two_stage=False,
+              fast_weights=None):
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(videos)))
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    for model_weights in filter(None, (weights, fast_weights)):
+        if not os.path.exists(exported_path(model_weights, backend, int8)):
+            export_model(model_weights, backend, int8)  # Export once up front rather than in every worker
+
+    print(f"Processing {len(videos)} video(s) with {workers} worker(s), {torch_threads} torch thread(s) each")
+    results = []
+    start = time.perf_counter()
+    # Spawn keeps each worker's torch runtime independent of the parent process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                             initargs=(weights, torch_threads, backend, int8, two_stage, fast_weights)) as pool:
+        futures = {pool.submit(process_video, video, output_dir): video for video in videos}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"video": futures[future], "error": str(e)}
+            results.append(result)
+            if "error" in result:
+                print(f"Failed {result['video']}: {result['error']}")
+            else:
+                print(f"Finished {result['video']}: {result['frames']} frames in {result['seconds']:.1f}s, "
+                      f"{result['events']} incidents, {result['skip_ratio']:.0%} frames skipped, report at {result['pdf']}")
+
+    elapsed = time.perf_counter() - start
+    total_frames = sum(result.get("frames", 0) for result in results)
+    print(f"Batch done: {total_frames} frames in {elapsed:.1f}s ({total_frames / max(elapsed, 1e-9):.1f} frames/s)")
+    return results
+
+
+def write_synthetic_clip(path, seconds=3, fps=10, size=(640, 480)):
+    # Small clip with moving shapes, enough to exercise the batch path end to end
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(int(seconds * fps)):
+        frame = np.full((height, width, 3), 40, dtype=np.uint8)
+        x = 50 + (i * 7) % (width - 200)
+        cv2.rectangle(frame, (x, 100), (x + 120, 400), (180, 160, 140), -1)
+        cv2.circle(frame, (x + 60, 80), 40, (150, 170, 200), -1)
+        cv2.rectangle(frame, (x + 80, 250), (x + 110, 310), (20, 20, 20), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-screen recorded sessions for phones and multiple humans")
+    parser.add_argument("inputs", nargs="*", help="Video files or directories containing videos")
+    parser.add_argument("--output", default="batch_output", help="Directory for per-video snapshots and reports")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: all cores)")
+    parser.add_argument("--model", default=model_path, help="YOLO weights used by every worker")
+    parser.add_argument("--backend", choices=backends, default="pytorch", help="Inference backend used by every worker")
+    parser.add_argument("--int8", action="store_true", help="Use the INT8-quantized export for onnx/openvino")
+    parser.add_argument("--two-stage", action="store_true", help="Re-run phone detection at high resolution on person crops")
+    parser.add_argument("--fast-model", default=None, help="Cascade: run these weights first and escalate uncertain frames")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many synthetic clips and process them")
+    args = parser.parse_args()
+
+    inputs = list(args.inputs)
+    if args.synthetic:
+        synthetic_dir = os.path.join(args.output, "synthetic")
+        for i in range(args.synthetic):
+            write_synthetic_clip(os.path.join(synthetic_dir, f"synthetic_{i}.mp4"))
+        inputs.append(synthetic_dir)
+
+    videos = find_videos(inputs)
+    if not videos:
+        parser.error("no video files found")
+    run_batch(videos, args.output, args.workers, args.model, args.backend, args.int8, args.two_stage, args.fast_model)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import time
+import cv2
+import numpy as np
+
+# quality -> (downscale factor, filter). "exact" matches the original full-resolution 71x71 blur.
+blur_qualities = {
+    "exact": (1, "gaussian"),
+    "high": (2, "gaussian"),
+    "medium": (4, "gaussian"),
+    "low": (8, "box"),
+}
+
+
+class BackgroundBlur:
+    # Privacy blur for everything outside the detected boxes. The blur runs on a downscaled
+    # copy and is scaled back up, into buffers that are reused from frame to frame. While the
+    # scene is static the last blurred background is reused instead of being recomputed.
+    def __init__(self, quality="medium", kernel=71, refresh_every=15):
+        self.base_kernel = kernel
+        self.refresh_every = refresh_every  # Recompute at least this often, even on static frames
+        self.set_quality(quality)
+        self.frames_since_refresh = 0
+        self.frames = 0
+        self.computed = 0
+        self.reused = 0
+        self.seconds = 0.0
+
+    def set_quality(self, quality):
+        # Switch quality between frames, e.g. from a latency controller; buffers are reallocated on the next frame
+        if quality not in blur_qualities:
+            raise ValueError(f"Unknown blur quality: {quality} (expected one of {', '.join(blur_qualities)})")
+        self.quality = quality
+        self.scale, self.filter = blur_qualities[quality]
+        self.kernel = max(3, int(round(self.base_kernel / self.scale)) | 1)  # Same blur radius at the reduced size
+        self.small = None
+        self.small_blurred = None
+        self.blurred = None
+
+    def refresh(self, frame):
+        height, width = frame.shape[:2]
+        if self.blurred is None or self.blurred.shape != frame.shape:
+            small_size = (max(1, height // self.scale), max(1, width // self.scale)) + frame.shape[2:]
+            self.small = np.empty(small_size, dtype=frame.dtype)
+            self.small_blurred = np.empty(small_size, dtype=frame.dtype)
+            self.blurred = np.empty_like(frame)
+
+        if self.scale == 1:
+            cv2.GaussianBlur(frame, (self.kernel, self.kernel), 0, dst=self.blurred)
+            return
+        small_height, small_width = self.small.shape[:2]
+        cv2.resize(frame, (small_width, small_height), dst=self.small, interpolation=cv2.INTER_AREA)
+        if self.filter == "box":
+            cv2.blur(self.small, (self.kernel, self.kernel), dst=self.small_blurred)
+        else:
+            cv2.GaussianBlur(self.small, (self.kernel, self.kernel), 0, dst=self.small_blurred)
+        cv2.resize(self.small_blurred, (width, height), dst=self.blurred, interpolation=cv2.INTER_LINEAR)
+
+    def background(self, frame, static=False, out=None):
+        # Returns a blurred copy of `frame` that the caller may draw on or hand over, written
+        # into `out` (e.g. a pooled buffer) when given
+        start = time.perf_counter()
+        self.frames += 1
+        stale = self.blurred is None or self.blurred.shape != frame.shape
+        if stale or not static or self.frames_since_refresh + 1 >= self.refresh_every:
+            self.refresh(frame)
+            self.frames_since_refresh = 0
+            self.computed += 1
+        else:
+            self.frames_since_refresh += 1
+            self.reused += 1
+        if out is None:
+            output = self.blurred.copy()
+        else:
+            np.copyto(out, self.blurred)
+            output = out
+        self.seconds += time.perf_counter() - start
+        return output
+
+    def composite(self, frame, boxes, static=False, out=None):
+        # Blurred background with the sharp pixels of each (x1, y1, x2, y2) box pasted back in
+        output = self.background(frame, static, out)
+        for x1, y1, x2, y2 in boxes:
+            output[y1:y2, x1:x2] = frame[y1:y2, x1:x2]
+        return output
+
+    def stats(self):
+        return {
+            "quality": self.quality,
+            "frames": self.frames,
+            "computed": self.computed,
+            "reused": self.reused,
+            "ms_per_frame": round(1000 * self.seconds / self.frames, 2) if self.frames else 0.0,
+        }
+
+
+def original_blur(frame, boxes):
+    # The per-frame path test2.py used before: full mask, full-resolution blur and np.where
+    mask = np.zeros(frame.shape[:2], dtype=np.uint8)
+    for x1, y1, x2, y2 in boxes:
+        cv2.rectangle(mask, (x1, y1), (x2, y2), 255, -1)
+    blurred_frame = cv2.GaussianBlur(frame, (71, 71), 0)
+    return np.where(mask[:, :, None] == 255, frame, blurred_frame)
+
+
+def benchmark(width=1280, height=720, frames=60, static_ratio=0.5):
+    # Synthetic frames with a couple of boxes; every other stretch of frames is static
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    boxes = [(width // 8, height // 6, width // 3, height - 20), (width // 2, height // 4, width // 2 + 120, height // 4 + 80)]
+    static_flags = [(i % 10) < static_ratio * 10 for i in range(frames)]
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        original_blur(base, boxes)
+    reference_ms = 1000 * (time.perf_counter() - start) / frames
+    print(f"{'original':>8}: {reference_ms:7.2f} ms/frame")
+
+    reference = original_blur(base, boxes).astype(np.int16)
+    for quality in blur_qualities:
+        blur = BackgroundBlur(quality)
+        start = time.perf_counter()
+        for static in static_flags:
+            output = blur.composite(base, boxes, static)
+        elapsed_ms = 1000 * (time.perf_counter() - start) / frames
+        difference = np.abs(output.astype(np.int16) - reference).mean()
+        print(f"{quality:>8}: {elapsed_ms:7.2f} ms/frame ({reference_ms / elapsed_ms:5.1f}x), "
+              f"mean abs difference {difference:5.2f}, {blur.stats()['reused']} blurs reused")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the background blur quality levels with the original blur")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--static-ratio", type=float, default=0.5, help="Fraction of frames the motion gate calls static")
+    args = parser.parse_args()
+    benchmark(args.width, args.height, args.frames, args.static_ratio)
+
+
+if __name__ == "__main__":
+    main()
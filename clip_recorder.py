@@ -0,0 +1,181 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+import cv2
+from metrics import queue_depth, bytes_written, write_seconds, writes_dropped
+
+clip_formats = {"mp4": (".mp4", "mp4v"), "mjpeg": (".avi", "MJPG")}  # format -> (extension, fourcc)
+clip_extensions = tuple(extension for extension, _ in clip_formats.values())
+
+
+def thumbnail_path(clip_path):
+    # Still image written next to each clip, so the PDF report can show it
+    return os.path.splitext(clip_path)[0] + "_thumb.jpg"
+
+
+def is_clip(path):
+    return path.lower().endswith(clip_extensions)
+
+
+class ClipRecorder:
+    # Keeps the last `pre_seconds` of downscaled frames in memory. When an incident starts,
+    # those frames plus the next `post_seconds` are encoded into one short clip (and a
+    # thumbnail) on a background thread, instead of writing a still image per event.
+    def __init__(self, pre_seconds=3.0, post_seconds=3.0, fps=10, scale_width=480, clip_format="mp4", max_pending=4):
+        if clip_format not in clip_formats:
+            raise ValueError(f"Unsupported clip format: {clip_format} (expected one of {', '.join(clip_formats)})")
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps  # Frames are sampled down to this rate before buffering
+        self.scale_width = scale_width
+        self.extension, self.fourcc = clip_formats[clip_format]
+        self.lock = threading.Lock()  # Frames arrive from the detection loop, clips start from the incident engine
+        self.recent = deque(maxlen=max(1, int(pre_seconds * fps)))
+        self.recording = []  # Clips still collecting post-event frames
+        self.unsettled = {}  # path -> clip not yet written, dropped or failed
+        self.last_time = None
+        self.tasks = queue.Queue(maxsize=max_pending)
+        self.clips_started = 0
+        self.clips_written = 0
+        self.clips_dropped = 0
+        self.clips_failed = 0
+        self.bytes_written = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def path_for(self, directory, name):
+        return os.path.join(directory, name + self.extension)
+
+    def add_frame(self, frame, now):
+        # `now` is in seconds, e.g. time.monotonic(); the frame is copied, so the caller keeps it
+        with self.lock:
+            if self.last_time is not None and now - self.last_time < 1.0 / self.fps:
+                return
+            self.last_time = now
+            height, width = frame.shape[:2]
+            scale_height = max(2, int(height * self.scale_width / width) // 2 * 2)  # Encoders want even sizes
+            small = cv2.resize(frame, (self.scale_width, scale_height), interpolation=cv2.INTER_AREA)
+            self.recent.append(small)
+
+            still_recording = []
+            for clip in self.recording:
+                clip["frames"].append(small)
+                if now >= clip["end_time"]:
+                    self.encode(clip)
+                else:
+                    still_recording.append(clip)
+            self.recording = still_recording
+
+    def start_clip(self, directory, name, on_written=None):
+        # Starts a clip from the buffered frames; the file is written once the post-event frames are in.
+        # `on_written(path)` is only called once the file is on disk, so a dropped or failed clip
+        # never ends up linked from an incident.
+        with self.lock:
+            if self.last_time is None:
+                return None
+            path = self.path_for(directory, name)
+            clip = {"path": path, "frames": list(self.recent), "trigger": len(self.recent) - 1,
+                    "end_time": self.last_time + self.post_seconds, "on_written": on_written,
+                    "done": threading.Event()}
+            self.recording.append(clip)
+            self.unsettled[path] = clip
+            self.clips_started += 1
+            return path
+
+    def wait(self, path, timeout=None):
+        # Block until the clip at `path` is written, dropped or failed, e.g. before its incident is
+        # recorded. A clip still collecting post-event frames is encoded right away with what it has.
+        with self.lock:
+            clip = self.unsettled.get(path)
+            if clip is None:
+                return
+            still_recording = [other for other in self.recording if other is not clip]
+            if len(still_recording) < len(self.recording):
+                self.recording = still_recording
+                self.encode(clip)
+        clip["done"].wait(timeout)
+
+    def finish_recording(self):
+        # Encode clips that are still waiting for post-event frames, e.g. when the session stops
+        with self.lock:
+            for clip in self.recording:
+                self.encode(clip)
+            self.recording = []
+
+    def clear(self):
+        # Forget the buffered frames when a session ends, so the next session's first clip
+        # does not open with them; clips still recording keep their own frames
+        with self.lock:
+            self.recent.clear()
+            self.last_time = None
+
+    def encode(self, clip):
+        try:
+            self.tasks.put_nowait(clip)
+        except queue.Full:
+            self.clips_dropped += 1
+            writes_dropped.inc(kind="clip")
+            print(f"Clip encoder is busy, dropped: {clip['path']}")
+            self.settle(clip)
+        queue_depth.set(self.tasks.qsize(), queue="clips")
+
+    def settle(self, clip):
+        # Called with the lock held
+        self.unsettled.pop(clip["path"], None)
+        clip["frames"] = []
+        clip["done"].set()
+
+    def run(self):
+        while True:
+            clip = self.tasks.get()
+            try:
+                self.write(clip)
+            except Exception as e:
+                with self.lock:
+                    self.clips_failed += 1
+                print(f"Failed to save clip at {clip['path']}: {e}")
+            finally:
+                with self.lock:
+                    self.settle(clip)
+                self.tasks.task_done()
+                queue_depth.set(self.tasks.qsize(), queue="clips")
+
+    def write(self, clip):
+        start = time.perf_counter()
+        path, frames = clip["path"], clip["frames"]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        height, width = frames[0].shape[:2]
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (width, height))
+        if not writer.isOpened():
+            raise RuntimeError(f"no {self.fourcc} encoder for {width}x{height} clips")
+        try:
+            for frame in frames:
+                writer.write(frame)
+        finally:
+            writer.release()
+        cv2.imwrite(thumbnail_path(path), frames[max(0, clip["trigger"])], [cv2.IMWRITE_JPEG_QUALITY, 80])
+        size = os.path.getsize(path)
+        with self.lock:
+            self.clips_written += 1
+            self.bytes_written += size
+        bytes_written.inc(size, kind="clip")
+        write_seconds.observe(time.perf_counter() - start, kind="clip")
+        if clip["on_written"] is not None:
+            clip["on_written"](path)
+
+    def flush(self):
+        # Block until every queued clip is on disk; clips still recording are not waited for
+        self.tasks.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "clips_started": self.clips_started,
+                "clips_written": self.clips_written,
+                "clips_dropped": self.clips_dropped,
+                "clips_failed": self.clips_failed,
+                "recording": len(self.recording),
+                "bytes_written": self.bytes_written,
+            }
@@ -0,0 +1,270 @@
+import functools
+import time
+import numpy as np
+from metrics import registry
+from tracker import iou_matrix
+
+person_class = 0  # COCO class id for 'person'
+phone_class = 67  # COCO class id for 'cell phone'
+detection_classes = [person_class, phone_class]  # The only classes the scripts use
+phone_conf_threshold = 0.5  # Phones below this confidence are ignored
+inference_seconds = registry.histogram("inference_seconds", "Latency of one model call")
+
+# Compact per-frame detections: integer pixel boxes, confidence and COCO class id
+detection_dtype = np.dtype([
+    ("x1", np.int32), ("y1", np.int32), ("x2", np.int32), ("y2", np.int32),
+    ("conf", np.float32), ("cls", np.int16),
+])
+
+
+def empty_detections():
+    return np.zeros(0, dtype=detection_dtype)
+
+
+def extract_detections(results, phone_threshold=phone_conf_threshold):
+    # One vectorized pass over all result tensors instead of a Python loop per box
+    data = [result.boxes.data.cpu().numpy() for result in results]
+    data = [d for d in data if len(d)]
+    if not data:
+        return empty_detections()
+    data = np.concatenate(data)  # Rows of x1, y1, x2, y2, conf, cls
+
+    classes = data[:, 5].astype(np.int16)
+    confs = data[:, 4]
+    keep = (classes == person_class) | ((classes == phone_class) & (confs > phone_threshold))
+    data = data[keep]
+
+    detections = np.empty(len(data), dtype=detection_dtype)
+    for i, field in enumerate(("x1", "y1", "x2", "y2")):
+        detections[field] = data[:, i]
+    detections["conf"] = data[:, 4]
+    detections["cls"] = data[:, 5]
+    return detections
+
+
+def run_detector(model, frame, phone_threshold=phone_conf_threshold, **kwargs):
+    # Class filtering happens inside the model's NMS, so the other 78 COCO classes never reach Python
+    start = time.perf_counter()
+    results = model(frame, classes=detection_classes, **kwargs)
+    inference_seconds.observe(time.perf_counter() - start, batch="single")
+    return extract_detections(results, phone_threshold)
+
+
+def run_detector_batch(model, frames, phone_threshold=phone_conf_threshold, **kwargs):
+    # One batched model call for several frames, e.g. one per camera; returns one array per frame
+    if not frames:
+        return []
+    start = time.perf_counter()
+    results = model(frames, classes=detection_classes, **kwargs)
+    inference_seconds.observe(time.perf_counter() - start, batch="multi")
+    return [extract_detections([result], phone_threshold) for result in results]
+
+
+def person_detections(detections):
+    return detections[detections["cls"] == person_class]
+
+
+def phone_detections(detections):
+    return detections[detections["cls"] == phone_class]
+
+
+def boxes_of(detections):
+    # (N, 4) float array of x1, y1, x2, y2 for geometry such as IoU matching
+    return np.stack([detections["x1"], detections["y1"], detections["x2"], detections["y2"]], axis=1).astype(np.float32)
+
+
+def incident_signals(phones, confirmed_tracks, frame_width, frame_height):
+    # Per-frame signals and their boxes for IncidentEngine.update()
+    human_count = len(confirmed_tracks)
+    signals = {
+        "Phone detected": float(phones["conf"].max()) if len(phones) else None,
+        "Multiple humans detected": sorted(track.confidence for track in confirmed_tracks)[-2] if human_count > 1 else None,
+    }
+    boxes = {
+        "Phone detected": boxes_of(phones),
+        "Multiple humans detected": [track.clipped_box(frame_width, frame_height) for track in confirmed_tracks],
+    }
+    return signals, boxes
+
+
+def crop_regions(persons, frame_shape, margin=0.25, head_fraction=0.2, min_size=16):
+    # Hands/torso region of each person: skip the head, widen the box for outstretched hands
+    frame_height, frame_width = frame_shape[:2]
+    regions = []
+    for x1, y1, x2, y2 in boxes_of(persons).astype(np.int32).tolist():
+        width, height = x2 - x1, y2 - y1
+        cx1 = max(0, x1 - int(margin * width))
+        cx2 = min(frame_width, x2 + int(margin * width))
+        cy1 = max(0, y1 + int(head_fraction * height))
+        cy2 = min(frame_height, y2 + int(margin * height / 2))
+        if cx2 - cx1 >= min_size and cy2 - cy1 >= min_size:
+            regions.append((cx1, cy1, cx2, cy2))
+    return regions
+
+
+def suppress_duplicates(detections, iou_threshold=0.5):
+    # Greedy NMS: keep the most confident of any overlapping boxes
+    if len(detections) < 2:
+        return detections
+    detections = detections[np.argsort(-detections["conf"])]
+    ious = iou_matrix(boxes_of(detections), boxes_of(detections))
+    keep = np.ones(len(detections), dtype=bool)
+    for i in range(len(detections)):
+        if keep[i]:
+            keep[i + 1:] &= ious[i, i + 1:] < iou_threshold
+    return detections[keep]
+
+
+class TwoStageDetector:
+    # Phones are small, so a full-frame pass at normal resolution misses them at a distance.
+    # A low-resolution pass finds the persons, then one batched high-resolution phone pass
+    # runs on crops around each person and its boxes are mapped back to frame coordinates.
+    def __init__(self, model, person_imgsz=320, phone_imgsz=640, max_crops=4):
+        self.model = model
+        self.person_imgsz = person_imgsz
+        self.phone_imgsz = phone_imgsz
+        self.max_crops = max_crops  # Crops of the most confident persons, to bound the batch size
+        self.frames = 0
+        self.crops = 0
+        self.crop_phones = 0  # Phones found only by the crop pass
+        self.person_seconds = 0.0
+        self.phone_seconds = 0.0
+
+    def __call__(self, frame, phone_threshold=phone_conf_threshold, **kwargs):
+        self.frames += 1
+        start = time.perf_counter()
+        detections = run_detector(self.model, frame, phone_threshold, imgsz=self.person_imgsz, **kwargs)
+        self.person_seconds += time.perf_counter() - start
+
+        persons = person_detections(detections)
+        persons = persons[np.argsort(-persons["conf"])[:self.max_crops]]
+        regions = crop_regions(persons, frame.shape)
+        if not regions:
+            return detections
+
+        start = time.perf_counter()
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        results = self.model(crops, classes=[phone_class], imgsz=self.phone_imgsz, **kwargs)  # One batch for all crops
+        inference_seconds.observe(time.perf_counter() - start, batch="crops")
+        crop_phones = []
+        for (x1, y1, _, _), result in zip(regions, results):
+            phones = phone_detections(extract_detections([result], phone_threshold))
+            for field, offset in (("x1", x1), ("x2", x1), ("y1", y1), ("y2", y1)):
+                phones[field] += offset  # Back to frame coordinates
+            crop_phones.append(phones)
+        self.phone_seconds += time.perf_counter() - start
+        self.crops += len(regions)
+
+        full_frame_phones = phone_detections(detections)
+        phones = suppress_duplicates(np.concatenate([full_frame_phones] + crop_phones))
+        self.crop_phones += max(0, len(phones) - len(full_frame_phones))
+        return np.concatenate([person_detections(detections), phones])
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "crops": self.crops,
+            "crop_phones": self.crop_phones,
+            "person_ms": round(1000 * self.person_seconds / self.frames, 1) if self.frames else 0.0,
+            "phone_ms": round(1000 * self.phone_seconds / self.frames, 1) if self.frames else 0.0,
+        }
+
+
+class CascadeDetector:
+    # Runs a fast model (e.g. yolov8n) on every frame and escalates to the accurate model only
+    # when the fast result is uncertain: a phone candidate inside the ambiguous confidence band
+    # around phone_conf_threshold, or a person count different from the previous frame.
+    def __init__(self, fast, accurate, band=(0.3, 0.7)):
+        self.fast = fast  # Detector callables, e.g. from make_detector()
+        self.accurate = accurate
+        self.band = band
+        self.last_person_count = None
+        self.frames = 0
+        self.escalated_phone = 0
+        self.escalated_persons = 0
+        self.fast_seconds = 0.0
+        self.accurate_seconds = 0.0
+
+    def __call__(self, frame, **kwargs):
+        self.frames += 1
+        low, high = self.band
+        start = time.perf_counter()
+        detections = self.fast(frame, phone_threshold=low, **kwargs)  # Keep candidates down to the band
+        self.fast_seconds += time.perf_counter() - start
+
+        phone_confs = phone_detections(detections)["conf"]
+        person_count = len(person_detections(detections))
+        if np.any(phone_confs < high):
+            self.escalated_phone += 1
+        elif self.last_person_count is not None and person_count != self.last_person_count:
+            self.escalated_persons += 1
+        else:
+            self.last_person_count = person_count
+            return detections  # Every phone is above the band, so all pass phone_conf_threshold
+
+        start = time.perf_counter()
+        detections = self.accurate(frame, **kwargs)
+        self.accurate_seconds += time.perf_counter() - start
+        self.last_person_count = len(person_detections(detections))
+        return detections
+
+    def stats(self):
+        escalated = self.escalated_phone + self.escalated_persons
+        stats = {
+            "frames": self.frames,
+            "escalated_phone": self.escalated_phone,
+            "escalated_persons": self.escalated_persons,
+            "escalation_rate": round(escalated / self.frames, 3) if self.frames else 0.0,
+            "fast_ms": round(1000 * self.fast_seconds / self.frames, 1) if self.frames else 0.0,
+            "accurate_ms": round(1000 * self.accurate_seconds / escalated, 1) if escalated else 0.0,
+        }
+        for name, detector in (("fast", self.fast), ("accurate", self.accurate)):
+            if hasattr(detector, "stats"):
+                stats[name] = detector.stats()
+        return stats
+
+
+def set_input_size(detector, imgsz):
+    # Changes the full-frame model input size of a detector built by make_detector(), also
+    # inside cascades and wrappers that keep it as `.detector` or handle it themselves with
+    # a set_input_size() method. Only for models that accept any size; exported ONNX/OpenVINO
+    # models are fixed to their export size.
+    if isinstance(detector, CascadeDetector):
+        set_input_size(detector.fast, imgsz)
+        set_input_size(detector.accurate, imgsz)
+    elif isinstance(detector, TwoStageDetector):
+        if not getattr(detector.model, "fixed_size", False):
+            detector.person_imgsz = imgsz
+    elif isinstance(detector, functools.partial):
+        if not getattr(detector.args[0], "fixed_size", False):
+            detector.args[0].imgsz = imgsz  # run_detector bound to an InferenceBackend
+    elif hasattr(detector, "set_input_size"):
+        detector.set_input_size(imgsz)  # e.g. a LazyDetector that may still be loading its model
+    elif getattr(detector, "detector", None) is not None:
+        set_input_size(detector.detector, imgsz)
+
+
+def warm_up(detector, frame):
+    # One call of every model behind a detector built by make_detector(), at the size it runs
+    # at, without going through the detector: its counters, a cascade's last person count and
+    # the inference_seconds histogram only see real frames. Wrappers are warmed as a whole.
+    if isinstance(detector, CascadeDetector):
+        warm_up(detector.fast, frame)
+        warm_up(detector.accurate, frame)  # A blank frame would never escalate to it
+    elif isinstance(detector, TwoStageDetector):
+        detector.model(frame, classes=detection_classes, imgsz=detector.person_imgsz, verbose=False)
+        detector.model([frame], classes=[phone_class], imgsz=detector.phone_imgsz, verbose=False)
+    elif isinstance(detector, functools.partial):
+        detector.args[0](frame, classes=detection_classes, verbose=False)
+    else:
+        detector(frame, verbose=False)
+
+
+def make_detector(model, two_stage=False, person_imgsz=320, phone_imgsz=640):
+    # A callable frame -> detections: one full-frame pass, or the two-stage person-crop pass.
+    # Exported ONNX/OpenVINO models run both passes at their export size.
+    if getattr(model, "fixed_size", False):
+        person_imgsz = phone_imgsz = model.imgsz
+    if two_stage:
+        return TwoStageDetector(model, person_imgsz=person_imgsz, phone_imgsz=phone_imgsz)
+    return functools.partial(run_detector, model)
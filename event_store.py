@@ -0,0 +1,146 @@
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import threading
+
+schema = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    confidence REAL NOT NULL,
+    boxes TEXT NOT NULL,
+    evidence_paths TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_time ON events (start_time);
+CREATE INDEX IF NOT EXISTS events_by_type ON events (event_type, start_time);
+"""
+
+alert_event_types = ("Phone detected", "Multiple humans detected")  # Highlighted in reports
+
+
+class Event:
+    def __init__(self, event_id, session, event_type, start_time, end_time, confidence, boxes, evidence_paths):
+        self.event_id = event_id
+        self.session = session
+        self.event_type = event_type
+        self.start_time = start_time  # datetime
+        self.end_time = end_time
+        self.confidence = confidence  # Peak confidence over the incident
+        self.boxes = boxes  # [x1, y1, x2, y2] boxes at the peak frame
+        self.evidence_paths = evidence_paths
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row["id"], row["session"], row["event_type"],
+                   datetime.datetime.fromtimestamp(row["start_time"]),
+                   datetime.datetime.fromtimestamp(row["end_time"]),
+                   row["confidence"], json.loads(row["boxes"]), json.loads(row["evidence_paths"]))
+
+    def duration(self):
+        return (self.end_time - self.start_time).total_seconds()
+
+    def is_alert(self):
+        return self.event_type in alert_event_types
+
+    def describe(self):
+        return (f"{self.event_type} from {self.start_time:%Y-%m-%d %H:%M:%S} to {self.end_time:%H:%M:%S} "
+                f"({self.duration():.0f}s, peak confidence {self.confidence:.2f})")
+
+
+class EventStore:
+    # Append-only SQLite log of closed incidents. WAL mode lets reports and other tools read
+    # the database while the detection loop keeps appending, and every event is committed
+    # as soon as it is recorded, so nothing is lost if the process dies.
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.lock = threading.Lock()  # One connection shared by the detection loop and the watcher
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent, commits skip an fsync
+        self.connection.executescript(schema)
+
+    def record(self, session, event_type, start_time, end_time, confidence, boxes=(), evidence_paths=()):
+        boxes = [[int(v) for v in box] for box in boxes]
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO events (session, event_type, start_time, end_time, confidence, boxes, evidence_paths) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session, event_type, start_time.timestamp(), end_time.timestamp(), float(confidence),
+                 json.dumps(boxes), json.dumps(list(evidence_paths))))
+        return Event(cursor.lastrowid, session, event_type, start_time, end_time, float(confidence),
+                     boxes, list(evidence_paths))
+
+    def record_incident(self, session, incident):
+        return self.record(session, incident.event_type, incident.start_time, incident.end_time or incident.last_seen,
+                           incident.peak_confidence, incident.peak_boxes, incident.frame_paths)
+
+    def query(self, session=None, event_types=None, since=None, until=None, limit=None):
+        # Events in time order; every filter is optional and served by the indexes
+        clauses, params = [], []
+        if session is not None:
+            clauses.append("session = ?")
+            params.append(session)
+        if event_types:
+            clauses.append(f"event_type IN ({', '.join('?' * len(event_types))})")
+            params.extend(event_types)
+        if since is not None:
+            clauses.append("start_time >= ?")
+            params.append(since.timestamp())
+        if until is not None:
+            clauses.append("start_time < ?")
+            params.append(until.timestamp())
+        sql = "SELECT * FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY start_time, id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self.lock:
+            rows = self.connection.execute(sql, params).fetchall()
+        return [Event.from_row(row) for row in rows]
+
+    def counts(self, session=None):
+        # Number of events per type, e.g. for a report summary
+        sql = "SELECT event_type, COUNT(*) FROM events"
+        params = []
+        if session is not None:
+            sql += " WHERE session = ?"
+            params.append(session)
+        with self.lock:
+            return dict(self.connection.execute(sql + " GROUP BY event_type", params).fetchall())
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the detection event store")
+    parser.add_argument("db", help="Path to the events database")
+    parser.add_argument("--session", default=None, help="Only events from this session")
+    parser.add_argument("--type", action="append", dest="event_types", help="Only events of this type (repeatable)")
+    parser.add_argument("--since", type=datetime.datetime.fromisoformat, default=None, help="ISO start time")
+    parser.add_argument("--until", type=datetime.datetime.fromisoformat, default=None, help="ISO end time")
+    parser.add_argument("--pdf", default=None, help="Write the matching events to this PDF report")
+    args = parser.parse_args()
+
+    store = EventStore(args.db)
+    events = store.query(args.session, args.event_types, args.since, args.until)
+    for event in events:
+        print(f"[{event.session}] {event.describe()} {event.evidence_paths}")
+    print(f"{len(events)} event(s)")
+    if args.pdf:
+        from report import create_pdf
+        create_pdf(events, args.pdf)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
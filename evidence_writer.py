@@ -0,0 +1,124 @@
+import os
+import queue
+import threading
+import time
+import cv2
+from metrics import queue_depth, bytes_written, write_seconds, writes_dropped
+
+image_extensions = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+
+
+def encode_params(image_format, quality, png_compression):
+    if image_format == "jpeg":
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if image_format == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    return [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+
+
+class EvidenceWriter:
+    # Bounded pool of background threads that encode and write evidence images, so the
+    # detection loop never waits on the disk. When the queue is full new work is dropped
+    # and counted instead of blocking the caller.
+    # With a `frame_pool`, queued frames are retained until they have been written.
+    def __init__(self, workers=2, max_pending=16, image_format="png", quality=90, png_compression=1, frame_pool=None):
+        if image_format not in image_extensions:
+            raise ValueError(f"Unsupported evidence format: {image_format} (expected png, jpeg or webp)")
+        self.image_format = image_format
+        self.params = encode_params(image_format, quality, png_compression)
+        self.frame_pool = frame_pool
+        self.tasks = queue.Queue(maxsize=max_pending)
+        self.lock = threading.Lock()
+        self.created_dirs = set()  # Directories already created, so makedirs runs once per directory
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.threads = [threading.Thread(target=self.run, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def path_for(self, directory, name):
+        return os.path.join(directory, name + image_extensions[self.image_format])
+
+    def submit(self, path, source):
+        if self.frame_pool is not None:
+            self.frame_pool.retain(source)
+        try:
+            self.tasks.put_nowait((path, source))
+        except queue.Full:
+            if self.frame_pool is not None:
+                self.frame_pool.release(source)
+            with self.lock:
+                self.dropped += 1
+            writes_dropped.inc(kind="evidence")
+            print(f"Evidence writer is busy, dropped: {path}")
+            return None
+        with self.lock:
+            self.submitted += 1
+        queue_depth.set(self.tasks.qsize(), queue="evidence")
+        return path
+
+    def submit_frame(self, directory, name, frame):
+        # The caller hands over the frame and must not draw on it afterwards
+        return self.submit(self.path_for(directory, name), frame)
+
+    def run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                self.tasks.task_done()
+                return
+            path, frame = task
+            try:
+                self.write(path, frame)
+            except Exception as e:
+                with self.lock:
+                    self.failed += 1
+                print(f"Failed to save evidence at {path}: {e}")
+            finally:
+                if self.frame_pool is not None:
+                    self.frame_pool.release(frame)
+                self.tasks.task_done()
+                queue_depth.set(self.tasks.qsize(), queue="evidence")
+
+    def write(self, path, frame):
+        start = time.perf_counter()
+        directory = os.path.dirname(path)
+        if directory not in self.created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self.created_dirs.add(directory)
+
+        ok, encoded = cv2.imencode(image_extensions[self.image_format], frame, self.params)
+        if not ok:
+            raise RuntimeError("encoding failed")
+        with open(path, "wb") as f:
+            f.write(encoded)  # Written straight from the encoder's buffer, no bytes copy
+        with self.lock:
+            self.written += 1
+            self.bytes_written += len(encoded)
+        bytes_written.inc(len(encoded), kind="evidence")
+        write_seconds.observe(time.perf_counter() - start, kind="evidence")
+
+    def flush(self):
+        # Block until everything queued so far is on disk, e.g. before building a report
+        self.tasks.join()
+
+    def close(self):
+        self.flush()
+        for _ in self.threads:
+            self.tasks.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": self.tasks.qsize(),
+                "bytes_written": self.bytes_written,
+            }
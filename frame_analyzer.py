@@ -0,0 +1,51 @@
+import time
+from detection import empty_detections, person_detections, phone_detections, boxes_of, incident_signals
+from motion_gate import MotionGate
+from tracker import PersonTracker
+
+
+class FrameAnalyzer:
+    # The per-frame step every pipeline shares: the motion gate and the tracker decide
+    # whether the model runs, the tracker keeps person IDs between model runs, and the
+    # result becomes incident signals. The model call itself is made by the caller between
+    # gate() and apply(), so each pipeline can time, batch, pool or await it its own way.
+    def __init__(self, motion_gate=None, person_tracker=None):
+        self.motion_gate = motion_gate or MotionGate()
+        self.person_tracker = person_tracker or PersonTracker()
+        self.last_detections = empty_detections()
+
+    def gate(self, frame):
+        # "detect" runs the model, "track" propagates the person tracks instead, None leaves
+        # a static frame with the last detections
+        if not self.motion_gate.should_infer(frame):
+            return None
+        if self.person_tracker.needs_detection() or self.motion_gate.forced:
+            return "detect"
+        return "track"
+
+    def apply(self, frame, step, detections=None, seconds=None):
+        # `detections` is the model output of a "detect" step, or None when the call failed
+        # and the last detections stay; `seconds` is the model time if the caller measured it.
+        # Returns the phones, the confirmed person tracks and the incident signals and boxes
+        # for IncidentEngine.update().
+        if detections is not None:
+            self.motion_gate.record_inference(seconds)
+            self.last_detections = detections
+            persons = person_detections(detections)
+            self.person_tracker.update(boxes_of(persons), persons["conf"])
+        elif step == "track":
+            self.person_tracker.predict()
+        phones = phone_detections(self.last_detections)
+        confirmed_tracks = self.person_tracker.confirmed_tracks()  # Only confirmed tracks count as humans
+        frame_height, frame_width = frame.shape[:2]
+        signals, boxes = incident_signals(phones, confirmed_tracks, frame_width, frame_height)
+        return phones, confirmed_tracks, signals, boxes
+
+    def step(self, frame, detect):
+        # gate() and apply() around a plain detect(frame) call
+        step = self.gate(frame)
+        if step != "detect":
+            return self.apply(frame, step)
+        start = time.perf_counter()
+        detections = detect(frame)
+        return self.apply(frame, step, detections, time.perf_counter() - start)
@@ -0,0 +1,115 @@
+import time
+import threading
+from collections import deque
+from metrics import registry
+
+frames_captured = registry.counter("frames_captured_total", "Frames read from the camera")
+frames_dropped = registry.counter("frames_dropped_total", "Frames skipped because a newer frame arrived first")
+
+
+class FrameRingBuffer:
+    # Bounded buffer of the most recent frames. When it is full the oldest frame
+    # is dropped, so the consumer always works on fresh data.
+    # `release` is called with every dropped frame, e.g. to hand it back to a FramePool.
+    def __init__(self, capacity=2, stale_after=0.5, release=None):
+        self.frames = deque(maxlen=capacity)
+        self.stale_after = stale_after  # Seconds after which a consumed frame counts as stale
+        self.release = release
+        self.condition = threading.Condition()
+        self.sequence = 0  # Sequence number of the last frame written
+        self.last_taken = 0  # Sequence number of the last frame handed out
+        self.last_captured_at = None  # time.monotonic() capture time of the last frame handed out
+        self.captured = 0
+        self.dropped = 0
+        self.stale = 0
+
+    def put(self, frame):
+        with self.condition:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1  # Drop-oldest: deque discards the left-most frame
+                frames_dropped.inc()
+                self.drop(self.frames[0][2])
+            self.sequence += 1
+            self.captured += 1
+            frames_captured.inc()
+            self.frames.append((self.sequence, time.monotonic(), frame))
+            self.condition.notify_all()
+
+    def get_latest(self, timeout=None):
+        # Return the newest frame not yet handed out, waiting up to `timeout` seconds
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.frames and self.frames[-1][0] > self.last_taken, timeout):
+                return None
+            sequence, captured_at, frame = self.frames[-1]
+            # Everything older than the newest frame is skipped without being processed
+            self.dropped += len(self.frames) - 1
+            if len(self.frames) > 1:
+                frames_dropped.inc(len(self.frames) - 1)
+            for _, _, skipped in list(self.frames)[:-1]:
+                self.drop(skipped)
+            self.frames.clear()
+            self.last_taken = sequence
+            self.last_captured_at = captured_at
+            if time.monotonic() - captured_at > self.stale_after:
+                self.stale += 1
+            return frame
+
+    def clear(self):
+        # Hand every frame still buffered to `release`, e.g. when the session ends
+        with self.condition:
+            for _, _, frame in self.frames:
+                self.drop(frame)
+            self.frames.clear()
+
+    def drop(self, frame):
+        if self.release is not None:
+            self.release(frame)
+
+    def stats(self):
+        with self.condition:
+            return {"captured": self.captured, "dropped": self.dropped, "stale": self.stale}
+
+
+class CaptureThread(threading.Thread):
+    # Reads frames on a dedicated thread so that slow inference never stalls the camera.
+    # `read_frame(buffer)` returns (ret, frame), or None while the camera is not available.
+    # With a `frame_pool`, every frame is read into a recycled buffer (cap.read(buffer)).
+    def __init__(self, read_frame, frame_buffer, stop_flag, idle_sleep=0.1, frame_pool=None):
+        super().__init__(daemon=True)
+        self.read_frame = read_frame
+        self.frame_buffer = frame_buffer
+        self.stop_flag = stop_flag
+        self.idle_sleep = idle_sleep
+        self.frame_pool = frame_pool
+        self.frame_shape = None  # Known after the first frame, until then the camera allocates
+        self.finished = threading.Event()  # Set once the stream has ended or capture stopped
+
+    def run(self):
+        try:
+            while not self.stop_flag.is_set():
+                buffer = None
+                if self.frame_pool is not None and self.frame_shape is not None:
+                    buffer = self.frame_pool.acquire(self.frame_shape, stage="capture")
+                result = self.read_frame(buffer)
+                if result is None:
+                    self.recycle(buffer)
+                    time.sleep(self.idle_sleep)
+                    continue
+
+                ret, frame = result
+                if not ret:
+                    self.recycle(buffer)
+                    break
+                if frame is not buffer:
+                    # First frame, or the camera changed resolution and allocated a new array
+                    self.recycle(buffer)
+                    if self.frame_pool is not None:
+                        self.frame_pool.adopt(frame, stage="capture")
+                    self.frame_shape = frame.shape
+                self.frame_buffer.put(frame)
+        finally:
+            self.finished.set()
+
+    def recycle(self, buffer):
+        if self.frame_pool is not None:
+            self.frame_pool.release(buffer)
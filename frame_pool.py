@@ -0,0 +1,80 @@
+import threading
+import numpy as np
+
+
+class FramePool:
+    # Recycles frame-sized arrays instead of allocating new ones every iteration. Buffers are
+    # reference counted: a stage that keeps a frame beyond the current iteration (ring buffer,
+    # incident engine, evidence writer) retains it and releases it when done, and the buffer
+    # goes back to the pool once the last holder lets go.
+    # Allocation counters are kept per stage; once the pool is warm they should stop growing.
+    def __init__(self, max_free=8):
+        self.max_free = max_free  # Idle buffers kept per shape, extra ones are left to the GC
+        self.lock = threading.Lock()
+        self.free = {}  # (shape, dtype) -> idle arrays
+        self.refs = {}  # id(array) -> [array, holders]
+        self.allocated = {}  # stage -> arrays allocated
+        self.reused = {}  # stage -> arrays taken from the pool
+        self.discarded = 0
+        self.peak_outstanding = 0
+
+    def acquire(self, shape, dtype=np.uint8, stage="frame"):
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self.lock:
+            idle = self.free.get(key)
+            if idle:
+                array = idle.pop()
+                self.reused[stage] = self.reused.get(stage, 0) + 1
+            else:
+                array = np.empty(shape, dtype=dtype)
+                self.allocated[stage] = self.allocated.get(stage, 0) + 1
+            self.track(array)
+        return array
+
+    def adopt(self, array, stage="frame"):
+        # Take over an array allocated elsewhere, e.g. by cap.read() before the frame size is known
+        with self.lock:
+            self.allocated[stage] = self.allocated.get(stage, 0) + 1
+            self.track(array)
+        return array
+
+    def track(self, array):
+        self.refs[id(array)] = [array, 1]
+        self.peak_outstanding = max(self.peak_outstanding, len(self.refs))
+
+    def retain(self, array):
+        # Arrays that did not come from the pool are ignored, so callers need not check
+        if array is None:
+            return
+        with self.lock:
+            ref = self.refs.get(id(array))
+            if ref is not None and ref[0] is array:
+                ref[1] += 1
+
+    def release(self, array):
+        if array is None:
+            return
+        with self.lock:
+            ref = self.refs.get(id(array))
+            if ref is None or ref[0] is not array:
+                return
+            ref[1] -= 1
+            if ref[1] > 0:
+                return
+            del self.refs[id(array)]
+            idle = self.free.setdefault((array.shape, array.dtype.str), [])
+            if len(idle) < self.max_free:
+                idle.append(array)
+            else:
+                self.discarded += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "allocated": dict(self.allocated),
+                "reused": dict(self.reused),
+                "outstanding": len(self.refs),
+                "peak_outstanding": self.peak_outstanding,
+                "idle": sum(len(idle) for idle in self.free.values()),
+                "discarded": self.discarded,
+            }
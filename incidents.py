@@ -0,0 +1,140 @@
+import threading
+
+
+class Incident:
+    def __init__(self, incident_id, event_type, start_time, confidence):
+        self.incident_id = incident_id
+        self.event_type = event_type  # e.g. "Phone detected" or "Multiple humans detected"
+        self.start_time = start_time
+        self.end_time = None
+        self.last_seen = start_time
+        self.peak_confidence = confidence
+        self.peak_boxes = []  # Boxes behind the signal at the peak frame
+        self.frame_paths = []  # Representative evidence: start, peak and end frames
+        self.frames_saved = 0
+        self.peak_frame = None  # Held in memory until the incident closes
+        self.last_frame = None
+
+    def duration(self):
+        return ((self.end_time or self.last_seen) - self.start_time).total_seconds()
+
+    def describe(self):
+        end_time = self.end_time or self.last_seen
+        return (f"{self.event_type} from {self.start_time:%Y-%m-%d %H:%M:%S} to {end_time:%H:%M:%S} "
+                f"({self.duration():.0f}s, peak confidence {self.peak_confidence:.2f})")
+
+
+class IncidentEngine:
+    # Collapses per-frame detections into incidents with hysteresis. A signal has to persist
+    # for `min_duration` seconds before an incident opens, and the incident only closes once
+    # the signal has been absent for `cooldown` seconds.
+    # `save_frame(incident, frame, role)` persists a representative frame and returns its paths.
+    # With a `frame_pool`, the peak and last frames held in memory are retained in the pool.
+    def __init__(self, save_frame, min_duration=1.0, cooldown=3.0, max_frames=3, frame_pool=None):
+        self.save_frame = save_frame
+        self.frame_pool = frame_pool
+        self.min_duration = min_duration
+        self.cooldown = cooldown
+        self.max_frames = max_frames  # Cap on frames saved per incident
+        self.lock = threading.Lock()  # The watcher closes incidents while the detection loop updates them
+        self.pending = {}  # event type -> [first_seen, last_seen, peak confidence, peak boxes]
+        self.active = {}  # event type -> open Incident
+        self.next_id = 1
+        self.frames_seen = 0
+        self.opened = 0
+        self.closed = 0
+        self.frames_saved = 0
+
+    def update(self, now, signals, frame, boxes=None):
+        # `signals` maps each event type to its confidence on this frame, or None when absent,
+        # and `boxes` optionally maps event types to the boxes behind the signal.
+        # Returns the incidents that closed on this frame.
+        boxes = boxes or {}
+        closed = []
+        with self.lock:
+            self.frames_seen += 1
+            for event_type, confidence in signals.items():
+                incident = self.active.get(event_type)
+                if confidence is not None:
+                    if incident is None:
+                        self.track_pending(now, event_type, confidence, frame, boxes.get(event_type))
+                    else:
+                        self.extend(incident, now, confidence, frame, boxes.get(event_type))
+                elif incident is not None:
+                    if (now - incident.last_seen).total_seconds() > self.cooldown:
+                        closed.append(self.close(incident))
+                elif event_type in self.pending:
+                    if (now - self.pending[event_type][1]).total_seconds() > self.cooldown:
+                        del self.pending[event_type]  # Too short-lived to become an incident
+        return closed
+
+    def track_pending(self, now, event_type, confidence, frame, boxes):
+        first_seen, _, peak, peak_boxes = self.pending.get(event_type, (now, now, confidence, boxes))
+        if confidence >= peak:
+            peak, peak_boxes = confidence, boxes
+        if (now - first_seen).total_seconds() < self.min_duration:
+            self.pending[event_type] = [first_seen, now, peak, peak_boxes]
+            return
+
+        self.pending.pop(event_type, None)  # Not there when the first sighting already lasts long enough
+        incident = Incident(self.next_id, event_type, first_seen, peak)
+        self.next_id += 1
+        incident.last_seen = now
+        incident.peak_boxes = [] if peak_boxes is None else peak_boxes
+        self.active[event_type] = incident
+        self.opened += 1
+        self.save(incident, frame, "start")
+        print(f"Incident opened: {event_type} at {first_seen:%Y-%m-%d %H:%M:%S}")
+
+    def extend(self, incident, now, confidence, frame, boxes):
+        incident.last_seen = now
+        incident.last_frame = self.hold(incident.last_frame, frame)
+        if confidence > incident.peak_confidence:
+            incident.peak_confidence = confidence
+            incident.peak_frame = self.hold(incident.peak_frame, frame)
+            incident.peak_boxes = [] if boxes is None else boxes
+
+    def close(self, incident):
+        incident.end_time = incident.last_seen
+        del self.active[incident.event_type]
+        # Peak and end frames are written only now, so an incident costs a few images at most
+        if incident.peak_frame is not None:
+            self.save(incident, incident.peak_frame, "peak")
+        if incident.last_frame is not None and incident.last_frame is not incident.peak_frame:
+            self.save(incident, incident.last_frame, "end")
+        self.hold(incident.peak_frame, None)
+        self.hold(incident.last_frame, None)
+        incident.peak_frame = incident.last_frame = None
+        self.closed += 1
+        print(f"Incident closed: {incident.describe()}")
+        return incident
+
+    def hold(self, old, new):
+        # Swap a held frame, keeping the pool's reference counts in step
+        if self.frame_pool is not None and old is not new:
+            self.frame_pool.retain(new)
+            self.frame_pool.release(old)
+        return new
+
+    def save(self, incident, frame, role):
+        if incident.frames_saved >= self.max_frames:
+            return
+        paths = self.save_frame(incident, frame, role) or []
+        incident.frame_paths.extend(paths)
+        incident.frames_saved += 1
+        self.frames_saved += 1
+
+    def close_all(self):
+        # Close every open incident, e.g. when the session stops
+        with self.lock:
+            self.pending.clear()
+            return [self.close(incident) for incident in list(self.active.values())]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "frames_seen": self.frames_seen,
+                "incidents_opened": self.opened,
+                "incidents_closed": self.closed,
+                "frames_saved": self.frames_saved,
+            }
@@ -0,0 +1,183 @@
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+
+backends = ("pytorch", "onnx", "openvino")
+default_weights = 'yolov8m.pt'
+
+
+def exported_path(weights, backend, int8=False):
+    # Where export_model() leaves the converted model for each backend
+    stem = os.path.splitext(weights)[0]
+    if backend == "pytorch":
+        return weights
+    if backend == "onnx":
+        return f"{stem}_int8.onnx" if int8 else f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+    raise ValueError(f"Unknown inference backend: {backend} (expected one of {', '.join(backends)})")
+
+
+def export_model(weights=default_weights, backend="onnx", int8=False, imgsz=640, calibration_data="coco8.yaml", dynamic=True):
+    # `dynamic` exports a variable batch size, so batched calls (person crops, several
+    # cameras) work; a static export only takes one image per call
+    from ultralytics import YOLO
+
+    target = exported_path(weights, backend, int8)
+    if backend == "pytorch":
+        return target
+
+    if backend == "onnx":
+        onnx_path = YOLO(weights).export(format="onnx", imgsz=imgsz, simplify=True, dynamic=dynamic)
+        if int8:
+            # Dynamic quantization needs no calibration set and keeps the graph inputs unchanged
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(onnx_path, target, weight_type=QuantType.QUInt8)
+            onnx_path = target
+        print(f"Exported ONNX model to: {onnx_path}")
+        return onnx_path
+
+    # OpenVINO runs post-training INT8 quantization on the calibration dataset
+    openvino_path = YOLO(weights).export(format="openvino", imgsz=imgsz, int8=int8, data=calibration_data, dynamic=dynamic)
+    print(f"Exported OpenVINO model to: {openvino_path}")
+    return openvino_path
+
+
+class InferenceBackend:
+    # Wraps a YOLO model loaded from any supported format. Calling it behaves like the
+    # original `model(frame)`, so the result objects expose the same boxes/conf/cls.
+    # A batch (list of images) that an exported model rejects, e.g. a static-batch export
+    # made before exports were dynamic, is run one image per call from then on.
+    def __init__(self, name, model, imgsz=640):
+        self.name = name
+        self.model = model
+        self.imgsz = imgsz  # Exported models have a fixed input size, so always pass it
+        self.fixed_size = name != "pytorch"  # Exported models only run at their export size
+        self.batching = True  # Cleared once the model has rejected a batch
+        self.names = model.names
+
+    def __call__(self, frame, **kwargs):
+        kwargs.setdefault("imgsz", self.imgsz)
+        if self.fixed_size and isinstance(frame, list) and len(frame) > 1:
+            if self.batching:
+                try:
+                    return self.model(frame, **kwargs)
+                except Exception as e:
+                    self.batching = False
+                    print(f"The {self.name} model does not take batches ({e}), running one image per call")
+            return [result for image in frame for result in self.model(image, **kwargs)]
+        return self.model(frame, **kwargs)
+
+
+def load_backend(backend="pytorch", weights=default_weights, int8=False, imgsz=640):
+    from ultralytics import YOLO
+
+    path = exported_path(weights, backend, int8)
+    if backend != "pytorch" and not os.path.exists(path):  # PyTorch weights are used as they are (or downloaded)
+        print(f"No {backend} model at {path}, exporting from {weights}...")
+        path = export_model(weights, backend, int8, imgsz)
+    return InferenceBackend(backend, YOLO(path, task="detect"), imgsz)
+
+
+def read_clip(clip_path, max_frames):
+    cap = cv2.VideoCapture(clip_path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def detections_of(results):
+    # Flatten results into (boxes, confs, classes) arrays for comparison between backends
+    boxes = [result.boxes.xyxy.cpu().numpy() for result in results]
+    confs = [result.boxes.conf.cpu().numpy() for result in results]
+    classes = [result.boxes.cls.cpu().numpy() for result in results]
+    return np.concatenate(boxes), np.concatenate(confs), np.concatenate(classes)
+
+
+def compare_detections(reference, candidate):
+    ref_boxes, ref_confs, ref_classes = reference
+    boxes, confs, classes = candidate
+    if len(ref_boxes) != len(boxes):
+        return {"same_count": False, "same_classes": False, "max_box_diff": None, "max_conf_diff": None}
+    # Order detections the same way on both sides before comparing them
+    ref_order = np.lexsort((ref_boxes[:, 1], ref_boxes[:, 0], ref_classes))
+    order = np.lexsort((boxes[:, 1], boxes[:, 0], classes))
+    return {
+        "same_count": True,
+        "same_classes": bool(np.array_equal(ref_classes[ref_order], classes[order])),
+        "max_box_diff": float(np.abs(ref_boxes[ref_order] - boxes[order]).max(initial=0.0)),
+        "max_conf_diff": float(np.abs(ref_confs[ref_order] - confs[order]).max(initial=0.0)),
+    }
+
+
+def benchmark_backends(clip_path, names=backends, weights=default_weights, int8=False, imgsz=640,
+                       max_frames=200, warmup=5):
+    frames = read_clip(clip_path, max_frames)
+    if not frames:
+        raise ValueError(f"No frames could be read from {clip_path}")
+
+    report = {}
+    reference = None
+    for name in names:
+        backend = load_backend(name, weights, int8 and name != "pytorch", imgsz)
+        for frame in frames[:warmup]:
+            backend(frame, verbose=False)
+
+        outputs = []
+        start = time.perf_counter()
+        for frame in frames:
+            outputs.append(detections_of(backend(frame, verbose=False)))
+        elapsed = time.perf_counter() - start
+
+        entry = {"fps": len(frames) / elapsed, "ms_per_frame": 1000 * elapsed / len(frames)}
+        if reference is None:
+            reference = outputs  # The first backend is the reference for output agreement
+        else:
+            comparisons = [compare_detections(ref, out) for ref, out in zip(reference, outputs)]
+            entry["frames_matching"] = sum(c["same_count"] and c["same_classes"] for c in comparisons)
+            box_diffs = [c["max_box_diff"] for c in comparisons if c["max_box_diff"] is not None]
+            entry["max_box_diff"] = max(box_diffs, default=0.0)
+        report[name] = entry
+        print(f"{name}: {entry['fps']:.1f} frames/s ({entry['ms_per_frame']:.1f} ms/frame)")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YOLO to CPU inference backends and benchmark them")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export weights for a backend")
+    export_parser.add_argument("--backend", choices=backends[1:], default="onnx")
+    export_parser.add_argument("--weights", default=default_weights)
+    export_parser.add_argument("--int8", action="store_true", help="Quantize weights to INT8")
+    export_parser.add_argument("--imgsz", type=int, default=640)
+    export_parser.add_argument("--data", default="coco8.yaml", help="Calibration dataset for OpenVINO INT8")
+
+    bench_parser = subparsers.add_parser("benchmark", help="Compare frames per second of backends on one clip")
+    bench_parser.add_argument("clip", nargs="?", help="Video clip to replay (default: a generated synthetic clip)")
+    bench_parser.add_argument("--backends", nargs="+", choices=backends, default=list(backends))
+    bench_parser.add_argument("--weights", default=default_weights)
+    bench_parser.add_argument("--int8", action="store_true", help="Benchmark INT8 exports of ONNX/OpenVINO")
+    bench_parser.add_argument("--imgsz", type=int, default=640)
+    bench_parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_model(args.weights, args.backend, args.int8, args.imgsz, args.data)
+    else:
+        clip = args.clip
+        if clip is None:
+            from batch_detect import write_synthetic_clip
+            clip = write_synthetic_clip(os.path.join("batch_output", "synthetic", "benchmark.mp4"), seconds=10)
+        benchmark_backends(clip, args.backends, args.weights, args.int8, args.imgsz, args.frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from metrics import registry, queue_depth
+
+max_frame_shape = (1080, 1920, 3)  # Largest frame a slot can hold
+worker_latency = registry.histogram("worker_inference_seconds", "Model time per frame inside an inference worker")
+
+
+def build_detector(weights, backend="pytorch", int8=False, two_stage=False, person_imgsz=320, phone_imgsz=640,
+                   fast_weights=None, band=(0.3, 0.7)):
+    # The same detector the scripts build, constructed inside each worker process
+    from detection import make_detector, CascadeDetector
+    from inference_backend import load_backend
+
+    detector = make_detector(load_backend(backend, weights, int8=int8), two_stage, person_imgsz, phone_imgsz)
+    if fast_weights:
+        fast = make_detector(load_backend(backend, fast_weights, int8=int8), two_stage, person_imgsz, phone_imgsz)
+        detector = CascadeDetector(fast, detector, band=band)
+    return detector
+
+
+def worker_main(worker_id, build, options, torch_threads, slot_names, tasks, results):
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)  # Workers share the cores instead of each taking all of them
+    except ImportError:
+        pass
+    try:
+        detector = build(**options)
+    except Exception as e:
+        results.send(("failed", worker_id, f"{type(e).__name__}: {e}"))
+        return
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]  # Owned and unlinked by the pool
+    results.send(("ready", worker_id))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        sequence, slot, shape = task
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=slots[slot].buf)  # A view, nothing is copied or pickled
+        start = time.perf_counter()
+        try:
+            detections = detector(frame, verbose=False)
+            results.send(("result", sequence, slot, detections, worker_id, time.perf_counter() - start))
+        except Exception as e:
+            results.send(("error", sequence, slot, f"{type(e).__name__}: {e}", worker_id, 0.0))
+        del frame  # Release the view before the slot is closed
+    for slot in slots:
+        slot.close()
+
+
+class InferencePool:
+    # Runs the detector in `workers` processes, so inference is not limited by this process's
+    # GIL and several frames are processed at once. Frames are copied into shared-memory slots
+    # and only the slot index crosses the process boundary; workers send back the compact
+    # detection arrays. Results are handed out in submission order.
+    # Every worker has its own task queue, and a frame is recorded as assigned to a worker
+    # before it is queued, so no frame is ever in flight without an owner. A worker that
+    # fails to load or exits is noticed by the collector thread: every frame assigned to it
+    # fails at once, and once no worker is left every call raises instead of hanging.
+    def __init__(self, options, workers=2, torch_threads=1, slots=None, max_shape=max_frame_shape, build=build_detector,
+                 check_interval=0.5):
+        context = multiprocessing.get_context("spawn")  # Fresh interpreters, safe with threads and torch
+        self.max_bytes = int(np.prod(max_shape))
+        self.slots = [shared_memory.SharedMemory(create=True, size=self.max_bytes) for _ in range(slots or 2 * workers)]
+        self.free_slots = queue.Queue()
+        for slot in range(len(self.slots)):
+            self.free_slots.put(slot)
+        self.tasks = [context.Queue() for _ in range(workers)]
+        self.condition = threading.Condition()
+        self.done = {}  # Sequence number -> detections, or the worker's error message
+        self.next_sequence = 0
+        self.ready_workers = 0
+        self.ready_at = None  # time.monotonic() once no worker is still loading its model and one has loaded it
+        self.assigned = [{} for _ in range(workers)]  # Per worker: sequence -> slot of the frames queued for it
+        self.exited = {}  # Worker id -> why it stopped
+        self.error = None  # Set once no worker is left
+        self.closing = False
+        self.stop_flag = threading.Event()
+        self.check_interval = check_interval  # Seconds between worker liveness checks
+        self.completed = 0
+        self.failed = 0
+        self.per_worker = [0] * workers
+        self.slot_waits = 0
+
+        if build is build_detector:
+            self.export_models(options)
+        slot_names = [slot.name for slot in self.slots]
+        # One result pipe per worker: a worker that dies mid-send can't block the others
+        self.processes, self.results = [], []
+        for i in range(workers):
+            reader, writer = context.Pipe(duplex=False)
+            process = context.Process(target=worker_main, daemon=True,
+                                      args=(i, build, options, torch_threads, slot_names, self.tasks[i], writer))
+            process.start()
+            writer.close()  # The worker holds the only writer, so its exit shows up as EOF
+            self.processes.append(process)
+            self.results.append(reader)
+        self.collector = threading.Thread(target=self.collect, daemon=True)
+        self.collector.start()
+
+    def export_models(self, options):
+        # Export once up front rather than racing in every worker
+        from inference_backend import export_model, exported_path
+
+        backend, int8 = options.get("backend", "pytorch"), options.get("int8", False)
+        if backend == "pytorch":
+            return  # Weights are loaded as they are; importing ultralytics here would only slow the start
+        for weights in filter(None, (options["weights"], options.get("fast_weights"))):
+            if not os.path.exists(exported_path(weights, backend, int8)):
+                export_model(weights, backend, int8)
+
+    def collect(self):
+        readers = list(self.results)
+        next_check = time.monotonic() + self.check_interval
+        while not self.stop_flag.is_set():
+            messages = []
+            for reader in multiprocessing.connection.wait(readers, timeout=self.check_interval):
+                try:
+                    messages.append(reader.recv())
+                except (EOFError, OSError):
+                    readers.remove(reader)  # The worker exited; check_workers finds out why
+                    next_check = 0
+            with self.condition:
+                for message in messages:
+                    self.handle(message)
+                if messages and self.ready_at is None:
+                    next_check = 0  # Loading progressed, see whether every worker is done
+                if time.monotonic() >= next_check:
+                    self.check_workers()
+                    next_check = time.monotonic() + self.check_interval
+                queue_depth.set(self.next_sequence - self.completed - self.failed, queue="inference")
+                self.condition.notify_all()
+
+    def handle(self, message):
+        kind = message[0]
+        if kind == "ready":
+            self.ready_workers += 1
+        elif kind == "failed":
+            _, worker_id, error = message
+            self.worker_gone(worker_id, f"failed to load the model: {error}")
+        else:
+            kind, sequence, slot, detections, worker_id, seconds = message
+            self.assigned[worker_id].pop(sequence, None)
+            self.finish(sequence, slot, detections if kind == "result" else RuntimeError(detections))
+            self.per_worker[worker_id] += 1
+            if kind == "result":
+                worker_latency.observe(seconds)
+
+    def finish(self, sequence, slot, detections):
+        self.free_slots.put(slot)
+        self.done[sequence] = detections
+        if isinstance(detections, Exception):
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def worker_gone(self, worker_id, reason):
+        # Called with the condition held: every frame queued for the worker fails
+        self.exited[worker_id] = reason
+        print(f"Inference worker {worker_id} {reason}")
+        for sequence, slot in self.assigned[worker_id].items():
+            self.finish(sequence, slot, RuntimeError(f"inference worker {worker_id} {reason} before answering frame {sequence}"))
+        self.assigned[worker_id].clear()
+
+    def check_workers(self):
+        # Called with the condition held
+        if self.closing:
+            return
+        for worker_id, process in enumerate(self.processes):
+            if worker_id not in self.exited and not process.is_alive():
+                self.worker_gone(worker_id, f"exited with code {process.exitcode}")
+        if self.ready_at is None and self.ready_workers and self.ready_workers + len(self.exited) >= len(self.processes):
+            self.ready_at = time.monotonic()
+        if len(self.exited) == len(self.processes) and self.error is None:
+            reasons = "; ".join(f"worker {worker_id} {reason}" for worker_id, reason in sorted(self.exited.items()))
+            self.error = RuntimeError(f"No inference worker left ({reasons})")
+
+    def wait_ready(self, timeout=300.0):
+        # Returns once every worker has loaded its model; raises if one failed or it takes too long
+        with self.condition:
+            ready = self.condition.wait_for(lambda: self.exited or self.ready_workers == len(self.processes), timeout)
+            if self.exited:
+                reasons = "; ".join(f"worker {worker_id} {reason}" for worker_id, reason in sorted(self.exited.items()))
+                raise RuntimeError(f"Inference workers did not start ({reasons})")
+            if not ready:
+                raise TimeoutError(f"{self.ready_workers} of {len(self.processes)} inference workers ready after {timeout}s")
+
+    def submit(self, frame):
+        # Copies the frame into a free slot (waiting for one if all are busy); returns its sequence number
+        if self.error is not None:
+            raise self.error
+        if frame.dtype != np.uint8 or frame.nbytes > self.max_bytes:
+            raise ValueError(f"Frame of shape {frame.shape} and type {frame.dtype} does not fit a {self.max_bytes} byte slot")
+        try:
+            slot = self.free_slots.get_nowait()
+        except queue.Empty:
+            self.slot_waits += 1
+            slot = None
+        while slot is None:
+            if self.error is not None:
+                raise self.error
+            try:
+                slot = self.free_slots.get(timeout=self.check_interval)
+            except queue.Empty:
+                pass
+        np.ndarray(frame.shape, dtype=np.uint8, buffer=self.slots[slot].buf)[...] = frame
+        with self.condition:
+            alive = [worker_id for worker_id in range(len(self.processes)) if worker_id not in self.exited]
+            if not alive:
+                self.free_slots.put(slot)
+                raise self.error or RuntimeError("No inference worker left")
+            worker_id = min(alive, key=lambda w: len(self.assigned[w]))  # The least busy worker
+            sequence = self.next_sequence
+            self.next_sequence += 1
+            self.assigned[worker_id][sequence] = slot
+            self.tasks[worker_id].put((sequence, slot, frame.shape))
+        return sequence
+
+    def ready(self, sequence):
+        # True once result(sequence) would return without waiting
+        with self.condition:
+            return sequence in self.done or self.error is not None
+
+    def result(self, sequence, timeout=60.0):
+        with self.condition:
+            if not self.condition.wait_for(lambda: sequence in self.done or self.error is not None, timeout):
+                raise TimeoutError(f"No result for frame {sequence} after {timeout}s")
+            if sequence not in self.done:
+                raise self.error
+            detections = self.done.pop(sequence)
+        if isinstance(detections, Exception):
+            raise detections
+        return detections
+
+    def __call__(self, frame, **kwargs):
+        # Drop-in for a detector call; the worker's own options apply
+        return self.result(self.submit(frame))
+
+    def map(self, frames):
+        # Detections for each frame in input order, keeping every slot busy
+        pending = []
+        for frame in frames:
+            if len(pending) == len(self.slots):
+                yield self.result(pending.pop(0))
+            pending.append(self.submit(frame))
+        for sequence in pending:
+            yield self.result(sequence)
+
+    def close(self, timeout=10.0):
+        with self.condition:
+            self.closing = True  # Workers exiting from here on are expected
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        self.stop_flag.set()
+        self.collector.join(timeout=timeout)
+        for tasks in self.tasks:
+            tasks.cancel_join_thread()  # Tasks left for dead workers must not block the exit
+        for reader in self.results:
+            reader.close()
+        for slot in self.slots:
+            slot.close()
+            slot.unlink()
+
+    def stats(self):
+        with self.condition:
+            return {
+                "workers": len(self.processes),
+                "ready_workers": self.ready_workers,
+                "exited_workers": len(self.exited),
+                "completed": self.completed,
+                "failed": self.failed,
+                "per_worker": list(self.per_worker),
+                "slot_waits": self.slot_waits,
+            }
@@ -0,0 +1,423 @@
+import argparse
+import asyncio
+import datetime
+import functools
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from detection import run_detector_batch
+from event_store import EventStore
+from evidence_writer import EvidenceWriter
+from frame_analyzer import FrameAnalyzer
+from incidents import IncidentEngine
+from inference_backend import backends, load_backend
+from report import create_pdf
+
+model_path = 'yolov8m.pt'  # Same model as the live scripts
+session_id_pattern = re.compile(r"^[A-Za-z0-9_-]{1,64}$")  # Session ids double as directory names
+content_length_pattern = re.compile(r"^[0-9]{1,12}$")  # Plain decimal, no sign or blanks
+max_frame_bytes = 8 * 1024 * 1024  # Larger request bodies are refused with a 413 before they are read
+
+
+class DynamicBatcher:
+    # Collects frames from many sessions into shared model calls. A batch is sent as soon as it
+    # holds `max_batch` frames or its oldest frame has waited `max_wait` seconds, whichever
+    # comes first. Model calls run on one worker thread so the event loop keeps serving.
+    def __init__(self, infer_batch, max_batch=8, max_wait=0.01):
+        self.infer_batch = infer_batch  # list of frames -> list of detection arrays
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.frames = 0
+        self.wait_seconds = 0.0
+        self.model_seconds = 0.0
+
+    async def submit(self, frame):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((frame, future, time.monotonic()))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = batch[0][2] + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            sent_at = time.monotonic()
+            self.wait_seconds += sum(sent_at - queued_at for _, _, queued_at in batch)
+            try:
+                results = await loop.run_in_executor(self.executor, self.infer_batch, [frame for frame, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.model_seconds += time.monotonic() - sent_at
+            self.batches += 1
+            self.frames += len(batch)
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "average_batch": round(self.frames / self.batches, 2) if self.batches else 0.0,
+            "average_wait_ms": round(1000 * self.wait_seconds / self.frames, 2) if self.frames else 0.0,
+            "average_model_ms": round(1000 * self.model_seconds / self.batches, 2) if self.batches else 0.0,
+            "queued": self.queue.qsize(),
+        }
+
+
+class RemoteSession:
+    # Per-session state of a remote client, with the same gating, labelling and incident
+    # semantics as detect_phone_and_humans(). Only the model call is shared between sessions.
+    def __init__(self, session_id, output_dir, evidence_writer, event_store):
+        self.session_id = session_id
+        self.snapshot_dir = os.path.join(output_dir, session_id, "snapshots")
+        self.pdf_path = os.path.join(output_dir, session_id, "detection_log.pdf")
+        self.evidence_writer = evidence_writer
+        self.event_store = event_store
+        self.lock = asyncio.Lock()  # Frames of one session are processed in order
+        self.frame_analyzer = FrameAnalyzer()
+        self.incident_engine = IncidentEngine(self.save_incident_frame)
+        self.frames = 0
+        self.events = 0
+        self.last_active = time.monotonic()
+
+    def record_incidents(self, incidents):
+        return [self.event_store.record_incident(self.session_id, incident) for incident in incidents]
+
+    def save_incident_frame(self, incident, frame, role):
+        name = f"{role}_{incident.start_time.strftime('%Y-%m-%d_%H-%M-%S')}_{incident.incident_id}"
+        image_path = self.evidence_writer.submit_frame(self.snapshot_dir, name, frame)
+        return [image_path] if image_path else []
+
+    async def process(self, frame, now, batcher):
+        async with self.lock:
+            self.last_active = time.monotonic()
+            self.frames += 1
+            step = self.frame_analyzer.gate(frame)
+            detections = await batcher.submit(frame) if step == "detect" else None
+            phones, confirmed_tracks, signals, boxes = self.frame_analyzer.apply(frame, step, detections)
+            frame_height, frame_width = frame.shape[:2]
+            incidents = self.incident_engine.update(now, signals, frame, boxes)
+            closed = await asyncio.get_running_loop().run_in_executor(None, self.record_incidents, incidents) if incidents else []
+            self.events += len(closed)
+            return {
+                "session": self.session_id,
+                "inferred": step == "detect",
+                "phones": [{"box": box[:4], "conf": round(box[4], 3)} for box in phones.tolist()],
+                "persons": [{"id": track.track_id, "box": track.clipped_box(frame_width, frame_height),
+                             "conf": round(track.confidence, 3)} for track in self.frame_analyzer.person_tracker.visible_tracks()],
+                "human_count": len(confirmed_tracks),
+                "closed_incidents": [event.describe() for event in closed],
+                "open_incidents": list(self.incident_engine.active),
+            }
+
+    async def close(self):
+        async with self.lock:
+            incidents = self.incident_engine.close_all()
+            closed = await asyncio.get_running_loop().run_in_executor(None, self.record_incidents, incidents)
+            self.events += len(closed)
+            return closed
+
+
+class IngestServer:
+    # Accepts JPEG frames over plain HTTP/1.1 with keep-alive:
+    #   POST /sessions/<id>/frames  body: JPEG, optional X-Frame-Time header (unix seconds)
+    #   POST /sessions/<id>/close   closes open incidents and writes the session's PDF report
+    #   GET  /stats                 batcher and per-session counters
+    # A request the server can't frame (bad request line or Content-Length, or a body over
+    # `max_frame_bytes`) gets a 400 or 413 and the connection is closed, since the next
+    # request's start is unknown.
+    def __init__(self, infer_batch, output_dir, max_batch=8, max_wait=0.01, session_timeout=60.0,
+                 max_frame_bytes=max_frame_bytes):
+        self.output_dir = output_dir
+        self.max_frame_bytes = max_frame_bytes
+        self.batcher = DynamicBatcher(infer_batch, max_batch, max_wait)
+        self.evidence_writer = EvidenceWriter()
+        self.event_store = EventStore(os.path.join(output_dir, "events.db"))
+        self.session_timeout = session_timeout  # Idle sessions are closed after this many seconds
+        self.sessions = {}
+        self.closed_sessions = 0
+        self.server = None
+        self.tasks = []
+        self.connections = {}  # Handler task -> writer of every open client connection
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self.tasks = [asyncio.create_task(self.batcher.run()), asyncio.create_task(self.expire_sessions())]
+        self.server = await asyncio.start_server(self.handle, host, port)
+        print(f"Ingest server listening on {host}:{port}")
+        return self.server
+
+    async def stop(self):
+        # Closing the client sockets ends their idle keep-alive reads; a request still being
+        # processed runs to completion while the batcher is alive, its response is dropped
+        self.server.close()
+        for writer in self.connections.values():
+            writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.server.wait_closed()
+        for session_id in list(self.sessions):
+            try:
+                await self.close_session(session_id)
+            except Exception as e:
+                print(f"Closing session {session_id} failed: {e!r}")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.evidence_writer.close)
+        await loop.run_in_executor(None, self.event_store.close)
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                parts = request_line.decode("latin-1").split()
+                length = headers.get("content-length", "0")
+                if len(parts) != 3:
+                    await self.respond(writer, "400 Bad Request", {"error": "malformed request line"})
+                    break
+                if not content_length_pattern.match(length):
+                    await self.respond(writer, "400 Bad Request", {"error": "Content-Length must be a non-negative integer"})
+                    break
+                if int(length) > self.max_frame_bytes:
+                    await self.respond(writer, "413 Payload Too Large",
+                                       {"error": f"frames are limited to {self.max_frame_bytes} bytes"})
+                    break
+                method, path, _ = parts
+                body = await reader.readexactly(int(length))
+
+                try:
+                    status, payload = await self.route(method, path, headers, body)
+                except Exception as e:
+                    print(f"Request {method} {path} failed: {e!r}")
+                    status, payload = "500 Internal Server Error", {"error": str(e) or type(e).__name__}
+                await self.respond(writer, status, payload)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # Client went away or sent something that isn't HTTP
+        finally:
+            del self.connections[task]
+            writer.close()
+
+    async def respond(self, writer, status, payload):
+        data = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        await writer.drain()
+
+    async def route(self, method, path, headers, body):
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts == ["stats"]:
+            return "200 OK", self.stats()
+        if method != "POST" or len(parts) != 3 or parts[0] != "sessions":
+            return "404 Not Found", {"error": f"no route for {method} {path}"}
+        session_id = parts[1]
+        if not session_id_pattern.match(session_id):
+            return "400 Bad Request", {"error": "session ids may only contain letters, digits, '-' and '_'"}
+
+        if parts[2] == "close":
+            events = await self.close_session(session_id)
+            return "200 OK", {"session": session_id, "incidents": [event.describe() for event in events]}
+        if parts[2] != "frames":
+            return "404 Not Found", {"error": f"no route for {method} {path}"}
+
+        frame = await asyncio.get_running_loop().run_in_executor(None, decode_frame, body)
+        if frame is None:
+            return "400 Bad Request", {"error": "could not decode the JPEG frame"}
+        now = datetime.datetime.now()
+        if "x-frame-time" in headers:
+            try:
+                now = datetime.datetime.fromtimestamp(float(headers["x-frame-time"]))
+            except (ValueError, OverflowError, OSError):
+                return "400 Bad Request", {"error": "X-Frame-Time must be unix seconds"}
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = RemoteSession(session_id, self.output_dir, self.evidence_writer,
+                                                                self.event_store)
+        return "200 OK", await session.process(frame, now, self.batcher)
+
+    async def close_session(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return []
+        await session.close()
+        self.closed_sessions += 1
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.evidence_writer.flush)
+        events = await loop.run_in_executor(None, functools.partial(self.event_store.query, session=session_id))
+        await loop.run_in_executor(None, create_pdf, events, session.pdf_path)
+        return events
+
+    async def expire_sessions(self):
+        while True:
+            await asyncio.sleep(self.session_timeout / 4)
+            for session_id, session in list(self.sessions.items()):
+                if time.monotonic() - session.last_active > self.session_timeout:
+                    print(f"Closing idle session: {session_id}")
+                    try:
+                        await self.close_session(session_id)
+                    except Exception as e:
+                        print(f"Closing session {session_id} failed: {e!r}")
+
+    def stats(self):
+        return {
+            "batcher": self.batcher.stats(),
+            "open_sessions": len(self.sessions),
+            "closed_sessions": self.closed_sessions,
+            "sessions": {session_id: {"frames": session.frames, "events": session.events}
+                         for session_id, session in self.sessions.items()},
+        }
+
+
+def decode_frame(data):
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+async def http_request(reader, writer, method, path, body=b"", headers=None):
+    # Minimal HTTP/1.1 client for the load generator
+    lines = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def synthetic_jpegs(count=30, size=(640, 480), quality=80):
+    # Moving person-like shapes, pre-encoded so the load generator measures the server, not itself
+    width, height = size
+    frames = []
+    for i in range(count):
+        frame = np.full((height, width, 3), 40, dtype=np.uint8)
+        x = 50 + (i * 7) % (width - 200)
+        cv2.rectangle(frame, (x, 100), (x + 120, 400), (180, 160, 140), -1)
+        cv2.circle(frame, (x + 60, 80), 40, (150, 170, 200), -1)
+        cv2.rectangle(frame, (x + 80, 250), (x + 110, 310), (20, 20, 20), -1)
+        frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    return frames
+
+
+async def run_client(host, port, session_id, frames, fps, seconds, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    loop = asyncio.get_running_loop()
+    next_send = loop.time()
+    try:
+        for i in range(int(seconds * fps)):
+            start = time.perf_counter()
+            status, _ = await http_request(reader, writer, "POST", f"/sessions/{session_id}/frames", frames[i % len(frames)],
+                                           {"X-Frame-Time": f"{time.time():.3f}"})
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(status)
+            next_send += 1 / fps
+            await asyncio.sleep(max(0.0, next_send - loop.time()))
+        await http_request(reader, writer, "POST", f"/sessions/{session_id}/close")
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, sessions=8, fps=5, seconds=10):
+    frames = synthetic_jpegs()
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(host, port, f"loadgen_{i}", frames, fps, seconds, latencies, errors)
+                           for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = 1000 * np.array(latencies or [0.0])
+    print(f"{len(latencies)} frames from {sessions} session(s) in {elapsed:.1f}s "
+          f"({len(latencies) / elapsed:.1f} frames/s), {len(errors)} error(s)")
+    print(f"Latency ms: p50 {np.percentile(latencies_ms, 50):.1f}, p95 {np.percentile(latencies_ms, 95):.1f}, "
+          f"p99 {np.percentile(latencies_ms, 99):.1f}")
+    reader, writer = await asyncio.open_connection(host, port)
+    _, stats = await http_request(reader, writer, "GET", "/stats", headers={"Connection": "close"})
+    writer.close()
+    print(f"Server stats: {stats['batcher']}")
+
+
+async def serve(args, run_load_test=False):
+    model = load_backend(args.backend, args.model, int8=args.int8)
+    infer_batch = functools.partial(run_detector_batch, model, verbose=False)
+    server = IngestServer(infer_batch, args.output, args.max_batch, args.max_wait_ms / 1000,
+                          max_frame_bytes=args.max_frame_bytes)
+    await server.start(args.host, args.port)
+    try:
+        if run_load_test:
+            await load_test(args.host, args.port, args.sessions, args.fps, args.seconds)
+        else:
+            await asyncio.Event().wait()  # Serve until interrupted
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Central frame ingestion with a dynamically batched model")
+    parser.add_argument("mode", choices=("serve", "loadgen"), help="Run the server, or a load test against one")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default="ingest_output", help="Directory for per-session snapshots and reports")
+    parser.add_argument("--model", default=model_path, help="YOLO weights shared by all sessions")
+    parser.add_argument("--backend", choices=backends, default="pytorch", help="Inference backend")
+    parser.add_argument("--int8", action="store_true", help="Use the INT8-quantized export for onnx/openvino")
+    parser.add_argument("--max-batch", type=int, default=8, help="Largest batch sent to the model")
+    parser.add_argument("--max-wait-ms", type=float, default=10.0, help="Longest a frame waits for its batch to fill")
+    parser.add_argument("--max-frame-bytes", type=int, default=max_frame_bytes, help="Largest JPEG frame accepted")
+    parser.add_argument("--sessions", type=int, default=8, help="loadgen: number of simulated clients")
+    parser.add_argument("--fps", type=float, default=5.0, help="loadgen: frames per second per client")
+    parser.add_argument("--seconds", type=float, default=10.0, help="loadgen: test duration")
+    parser.add_argument("--local", action="store_true", help="loadgen: start an in-process server to test against")
+    args = parser.parse_args()
+
+    try:
+        if args.mode == "serve":
+            asyncio.run(serve(args))
+        elif args.local:
+            asyncio.run(serve(args, run_load_test=True))
+        else:
+            asyncio.run(load_test(args.host, args.port, args.sessions, args.fps, args.seconds))
+    except KeyboardInterrupt:
+        print("Program stopped manually.")
+
+
+if __name__ == "__main__":
+    main()
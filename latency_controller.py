@@ -0,0 +1,102 @@
+import datetime
+import json
+import os
+import time
+import numpy as np
+from blur import blur_qualities
+from metrics import registry
+
+quality_level = registry.gauge("quality_level", "Current step of the latency controller, 0 is full quality")
+quality_changes = registry.counter("quality_changes_total", "Quality steps taken by the latency controller")
+
+
+def degradation_ladder(imgsz=640, detect_every=5, blur_quality=None, steps=3, confidence_decay=0.9):
+    # Full quality first, then each step halves the inference rate, shrinks the model input
+    # by a quarter (kept a multiple of the 32 px stride) and picks the next cheaper blur.
+    # The tracker re-detects early once a propagated track decays below its minimum
+    # confidence, so each step also takes the square root of the per-frame decay: that
+    # doubles the frames a track lasts, in step with detect_every.
+    # A None setting (e.g. imgsz for a fixed-size exported model) is never changed.
+    qualities = list(blur_qualities)
+    levels = [{"imgsz": imgsz, "detect_every": detect_every, "confidence_decay": confidence_decay,
+               "blur_quality": blur_quality}]
+    for _ in range(steps):
+        level = dict(levels[-1])
+        level["detect_every"] *= 2
+        level["confidence_decay"] = round(level["confidence_decay"] ** 0.5, 4)
+        if level["imgsz"]:
+            level["imgsz"] = max(160, int(level["imgsz"] * 0.75) // 32 * 32)
+        if level["blur_quality"]:
+            level["blur_quality"] = qualities[min(qualities.index(level["blur_quality"]) + 1, len(qualities) - 1)]
+        levels.append(level)
+    return levels
+
+
+class LatencyController:
+    # Keeps capture-to-result latency within `budget` seconds. Every `window` frames the p95
+    # latency is compared with the budget: above it, the next cheaper level of `levels` is
+    # applied; below `headroom` x budget, the previous better level comes back. After a change
+    # the controller holds for `hold` seconds so the effect shows up before the next decision.
+    # apply(settings) is called with the chosen level; every decision is printed and, with
+    # `log_path`, appended there as a JSON line.
+    def __init__(self, budget, levels, apply, window=30, headroom=0.6, hold=3.0, log_path=None):
+        self.budget = budget
+        self.levels = levels
+        self.apply = apply
+        self.window = window
+        self.headroom = headroom
+        self.hold = hold
+        self.log_path = log_path
+        self.level = 0
+        self.samples = []
+        self.last_change = time.monotonic()
+        self.decisions = []
+        self.apply(self.levels[0])  # A new session always starts at full quality
+        quality_level.set(0)
+
+    def observe(self, latency):
+        self.samples.append(latency)
+        if len(self.samples) < self.window:
+            return
+        p95 = float(np.percentile(self.samples, 95))
+        self.samples = []
+        if time.monotonic() - self.last_change < self.hold:
+            return
+        if p95 > self.budget and self.level < len(self.levels) - 1:
+            self.change(self.level + 1, p95)
+        elif p95 < self.headroom * self.budget and self.level > 0:
+            self.change(self.level - 1, p95)
+
+    def change(self, level, p95):
+        direction = "down" if level > self.level else "up"
+        decision = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "direction": direction,
+            "from_level": self.level,
+            "to_level": level,
+            "p95_ms": round(1000 * p95, 1),
+            "budget_ms": round(1000 * self.budget, 1),
+            "settings": self.levels[level],
+        }
+        self.level = level
+        self.last_change = time.monotonic()
+        self.decisions.append(decision)
+        self.apply(self.levels[level])
+        quality_level.set(level)
+        quality_changes.inc(direction=direction)
+        print(f"Latency p95 {decision['p95_ms']} ms vs budget {decision['budget_ms']} ms: quality {direction} to level {level} {self.levels[level]}")
+        if self.log_path:
+            try:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(decision) + "\n")
+            except OSError as e:
+                print(f"Failed to log latency decision to {self.log_path}: {e}")
+
+    def stats(self):
+        return {
+            "level": self.level,
+            "settings": self.levels[self.level],
+            "steps_down": sum(decision["direction"] == "down" for decision in self.decisions),
+            "steps_up": sum(decision["direction"] == "up" for decision in self.decisions),
+        }
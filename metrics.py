@@ -0,0 +1,220 @@
+import bisect
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+latency_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in key) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.lock = threading.Lock()
+        self.values = {}  # Label tuple -> value
+
+    def inc(self, amount=1, **labels):
+        key = label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, value) for key, value in self.values.items()]
+
+    def snapshot(self):
+        with self.lock:
+            return {format_labels(key): value for key, value in self.values.items()}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = label_key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=latency_buckets):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.values = {}  # Label tuple -> [per-bucket counts (last one is +Inf), sum, count]
+
+    def observe(self, value, **labels):
+        key = label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, (counts, total, count) in self.values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    samples.append((self.name + "_bucket", key + (("le", bound),), cumulative))
+                samples.append((self.name + "_sum", key, total))
+                samples.append((self.name + "_count", key, count))
+        return samples
+
+    def snapshot(self):
+        with self.lock:
+            return {format_labels(key): {"count": count, "sum": round(total, 6)}
+                    for key, (_, total, count) in self.values.items()}
+
+
+class MetricsRegistry:
+    # Process-wide counters, gauges and histograms. Updating a metric is one dict update under
+    # a lock, cheap enough to leave on in the detection loop. Asking for an existing name
+    # returns the same metric, so modules can declare what they record at import time.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def get(self, metric_class, name, help, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = metric_class(name, help, **kwargs)
+            elif type(metric) is not metric_class:
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help):
+        return self.get(Counter, name, help)
+
+    def gauge(self, name, help):
+        return self.get(Gauge, name, help)
+
+    def histogram(self, name, help, buckets=latency_buckets):
+        return self.get(Histogram, name, help, buckets=buckets)
+
+    def render(self):
+        # Prometheus text exposition format
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+registry = MetricsRegistry()  # Shared by every module in the process
+
+# Output metrics shared by the evidence writer, clip recorder and report, labelled by kind
+queue_depth = registry.gauge("queue_depth", "Items waiting in a background queue")
+bytes_written = registry.counter("bytes_written_total", "Bytes written to disk")
+write_seconds = registry.histogram("write_seconds", "Time to encode and write one output file")
+writes_dropped = registry.counter("writes_dropped_total", "Outputs dropped because their queue was full")
+
+# Detection loop metrics, labelled by camera where there are several
+frames_processed = registry.counter("frames_processed_total", "Frames that went through the detection loop")
+frame_seconds = registry.histogram("frame_seconds", "Time from taking a frame to finishing it")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        registry = self.server.registry
+        if self.path == "/metrics":
+            body, content_type = registry.render().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(registry.snapshot()).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would flood the detection output
+
+
+class MetricsServer:
+    # Serves /metrics (Prometheus text) and /metrics.json on a local port
+    def __init__(self, port=9100, host="127.0.0.1", registry=registry):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.registry = self.registry
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Metrics available at http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class MetricsDumper:
+    # Writes a JSON snapshot to `path` every `interval` seconds, replacing the file atomically
+    def __init__(self, path, interval=30.0, registry=registry):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.stop_flag = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stop_flag.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.registry.snapshot(), f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Failed to write metrics to {self.path}: {e}")
+
+    def stop(self):
+        self.stop_flag.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        self.dump()  # Leave the final numbers behind
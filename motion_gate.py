@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    # Cheap pre-stage in front of the model: compares a downscaled grey copy of each frame
+    # with the frame the model last ran on and skips inference while the scene is static.
+    def __init__(self, threshold=0.01, pixel_delta=25, scale_width=160, force_every=30):
+        self.threshold = threshold  # Fraction of changed pixels that counts as motion
+        self.pixel_delta = pixel_delta  # Minimum grey-level change for a pixel to count as changed
+        self.scale_width = scale_width  # Width of the downscaled comparison image
+        self.force_every = force_every  # Safety net: always run the model after this many skipped frames
+        self.reference = None
+        self.frames_since_inference = 0
+        self.forced = False  # True when the last positive decision came from the safety net
+        self.frames = 0
+        self.moved = 0  # Frames that passed the gate; the tracker may still skip the model on them
+        self.inferred = 0  # Frames the model actually ran on, see record_inference()
+        self.skipped = 0
+        self.inference_seconds = 0.0
+        self.timed = 0  # Model runs whose time was recorded
+
+    def prepare(self, frame):
+        height, width = frame.shape[:2]
+        scale_height = max(1, int(height * self.scale_width / width))
+        small = cv2.resize(frame, (self.scale_width, scale_height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)  # Suppress sensor noise before differencing
+
+    def changed_fraction(self, small):
+        if self.reference is None or self.reference.shape != small.shape:
+            return 1.0
+        diff = cv2.absdiff(small, self.reference)
+        return np.count_nonzero(diff > self.pixel_delta) / diff.size
+
+    def should_infer(self, frame):
+        self.frames += 1
+        small = self.prepare(frame)
+        self.forced = self.frames_since_inference + 1 >= self.force_every
+        if self.forced or self.changed_fraction(small) >= self.threshold:
+            # Compare later frames against this one so slow drift still accumulates into motion
+            self.reference = small
+            self.frames_since_inference = 0
+            self.moved += 1
+            return True
+
+        self.frames_since_inference += 1
+        self.skipped += 1
+        return False
+
+    def record_inference(self, seconds=None):
+        # Called for every frame the model ran on, with its time when the caller measured it
+        self.inferred += 1
+        if seconds is not None:
+            self.inference_seconds += seconds
+            self.timed += 1
+
+    def stats(self):
+        skip_ratio = self.skipped / self.frames if self.frames else 0.0
+        average_inference = self.inference_seconds / self.timed if self.timed else 0.0
+        return {
+            "frames": self.frames,
+            "moved": self.moved,
+            "inferred": self.inferred,
+            "skipped": self.skipped,
+            "skip_ratio": round(skip_ratio, 3),
+            "model_seconds_saved": round(self.skipped * average_inference, 2),  # Estimated from the average inference time
+        }
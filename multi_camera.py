@@ -0,0 +1,319 @@
+import argparse
+import datetime
+import os
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+from detection import run_detector_batch
+from event_store import EventStore
+from evidence_writer import EvidenceWriter
+from frame_analyzer import FrameAnalyzer
+from frame_buffer import FrameRingBuffer, CaptureThread
+from frame_pool import FramePool
+from incidents import IncidentEngine
+from inference_backend import backends, load_backend
+from inference_pool import InferencePool
+from metrics import MetricsServer, frames_processed, frame_seconds
+from report import StreamingReportWriter
+
+model_path = 'yolov8m.pt'  # Same model as the live scripts
+
+
+def parse_source(source):
+    # Webcam indices are given as plain numbers, everything else is a file path or stream URL
+    return int(source) if source.isdigit() else source
+
+
+def open_capture(name, source):
+    # An opened capture, or None; a source that can't be opened gets no report, threads or directories
+    cap = cv2.VideoCapture(parse_source(source))
+    if not cap.isOpened():
+        print(f"[{name}] Error: failed to open {source}")
+        cap.release()
+        return None
+    return cap
+
+
+class CameraSource:
+    # One camera: its own capture thread, motion gate, tracker, incidents and report.
+    # Model calls are made by MultiCameraRunner, which batches frames across sources.
+    # `cap` is an already opened cv2.VideoCapture, see open_capture().
+    def __init__(self, name, source, cap, output_dir, frame_pool, evidence_writer, event_store, session):
+        self.name = name
+        self.source = source
+        self.snapshot_dir = os.path.join(output_dir, name, "snapshots")
+        self.frame_pool = frame_pool
+        self.evidence_writer = evidence_writer
+        self.event_store = event_store
+        self.session = f"{name}@{session}"
+        self.stop_flag = threading.Event()
+        self.cap = cap
+        self.frame_buffer = FrameRingBuffer(capacity=2, release=frame_pool.release)
+        self.capture_thread = CaptureThread(self.read_frame, self.frame_buffer, self.stop_flag, frame_pool=frame_pool)
+        self.frame_analyzer = FrameAnalyzer()  # The same gating, tracking and incident signals as the single-camera loop
+        self.incident_engine = IncidentEngine(self.save_incident_frame, frame_pool=frame_pool)
+        self.report_writer = StreamingReportWriter(os.path.join(output_dir, name, "detection_log.pdf"),
+                                                   before_render=evidence_writer.flush)
+        self.frames = 0
+        self.detections_run = 0
+        self.latencies = []  # Capture-to-result seconds of recent frames
+        self.pending = deque()  # (frame, captured_at, step, sequence) waiting on the inference pool, oldest first
+        self.started_at = None
+
+    def read_frame(self, buffer=None):
+        return self.cap.read(buffer)
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.capture_thread.start()
+
+    def save_incident_frame(self, incident, frame, role):
+        name = f"{role}_{incident.start_time.strftime('%Y-%m-%d_%H-%M-%S')}_{incident.incident_id}"
+        image_path = self.evidence_writer.submit_frame(self.snapshot_dir, name, frame)
+        return [image_path] if image_path else []
+
+    def gate(self, frame):
+        # "detect" runs the model, "track" propagates the person tracks instead, None leaves
+        # a static frame with the last detections
+        return self.frame_analyzer.gate(frame)
+
+    def process(self, frame, captured_at, detections=None, show=False, step=None, seconds=None):
+        phones, confirmed_tracks, signals, boxes = self.frame_analyzer.apply(frame, step, detections, seconds)
+        if detections is not None:
+            self.detections_run += 1
+        # Without a window, boxes are only drawn on frames that may become incident evidence
+        if show or len(phones) > 0 or len(confirmed_tracks) > 1:
+            for x1, y1, x2, y2, conf, _ in phones.tolist():
+                color = (0, 255, 0)  # Green for cell phones
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                cv2.putText(frame, f'cell phone {conf:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            for track in self.frame_analyzer.person_tracker.visible_tracks():
+                x1, y1, x2, y2 = track.clipped_box(frame.shape[1], frame.shape[0])
+                color = (255, 0, 0)  # Blue for humans
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                cv2.putText(frame, f'Person {track.track_id} {track.confidence:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        for incident in self.incident_engine.update(datetime.datetime.now(), signals, frame, boxes):
+            self.report_writer.add(self.event_store.record_incident(self.session, incident))
+
+        if show:
+            cv2.imshow(f"Phone and Human Detection - {self.name}", frame)
+        self.frames += 1
+        self.latencies.append(time.monotonic() - captured_at)
+        frames_processed.inc(camera=self.name)
+        frame_seconds.observe(self.latencies[-1], camera=self.name)
+        del self.latencies[:-500]  # Keep a recent window only
+        self.frame_pool.release(frame)
+
+    def stop(self):
+        self.stop_flag.set()
+        self.capture_thread.join(timeout=2)
+        self.frame_buffer.clear()  # Frames captured but never processed go back to the pool
+        self.cap.release()
+        for incident in self.incident_engine.close_all():  # Incidents still open when the source stops
+            self.report_writer.add(self.event_store.record_incident(self.session, incident))
+        self.report_writer.finalize()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            "frames": self.frames,
+            "fps": round(self.frames / elapsed, 1) if elapsed else 0.0,
+            "detections_run": self.detections_run,
+            "latency_ms_p50": round(1000 * float(np.percentile(latencies, 50)), 1),
+            "latency_ms_p95": round(1000 * float(np.percentile(latencies, 95)), 1),
+            "capture": self.frame_buffer.stats(),
+        }
+
+
+class MultiCameraRunner:
+    # Polls every source once per tick and makes a single batched model call for all the
+    # frames that need detection, so N cameras cost one inference call instead of N.
+    # With a `pool` (InferencePool), frames are submitted to its worker processes instead and
+    # each source keeps several in flight: the next frame is submitted before the previous
+    # result is collected, so the workers overlap even with a single camera. Frames of a
+    # source are still processed in capture order.
+    def __init__(self, sources, output_dir, model, show=False, idle_sleep=0.005, pool=None, result_timeout=30.0):
+        self.model = model
+        self.pool = pool
+        self.result_timeout = result_timeout  # Seconds to wait for a worker before giving up
+        self.show = show
+        self.idle_sleep = idle_sleep
+        self.stop_flag = threading.Event()
+        self.frame_pool = FramePool()
+        self.evidence_writer = EvidenceWriter(frame_pool=self.frame_pool)
+        self.event_store = EventStore(os.path.join(output_dir, "events.db"))
+        session = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        self.sources = []
+        for i, source in enumerate(sources):
+            cap = open_capture(f"camera_{i}", source)
+            if cap is not None:
+                self.sources.append(CameraSource(f"camera_{i}", source, cap, output_dir, self.frame_pool,
+                                                 self.evidence_writer, self.event_store, session))
+        self.ticks = 0
+        self.batched_frames = 0
+        self.model_seconds = 0.0
+
+    def tick(self):
+        if self.pool is not None:
+            return self.tick_pooled()
+        ready = []
+        for source in self.sources:
+            frame = source.frame_buffer.get_latest(timeout=0)
+            if frame is not None:
+                ready.append((source, frame, source.frame_buffer.last_captured_at, source.gate(frame)))
+        if not ready:
+            return False
+
+        batch = [(source, frame) for source, frame, _, step in ready if step == "detect"]
+        results = {}
+        if batch:
+            start = time.perf_counter()
+            detections = run_detector_batch(self.model, [frame for _, frame in batch], verbose=False)
+            seconds = time.perf_counter() - start
+            self.model_seconds += seconds
+            # Each frame is charged its share of the batched call
+            results = {id(source): (result, seconds / len(batch)) for (source, _), result in zip(batch, detections)}
+            self.batched_frames += len(batch)
+            self.ticks += 1
+
+        for source, frame, captured_at, step in ready:
+            detections, seconds = results.get(id(source), (None, None))
+            source.process(frame, captured_at, detections, self.show, step, seconds)
+        return True
+
+    def tick_pooled(self):
+        # Submit each source's newest frame, then process whatever has come back, in order
+        in_flight = max(1, len(self.pool.slots) // len(self.sources))  # Per source, so no camera starves the others
+        progressed = False
+        for source in self.sources:
+            if len(source.pending) < in_flight:
+                frame = source.frame_buffer.get_latest(timeout=0)
+                if frame is not None:
+                    step = source.gate(frame)
+                    sequence = self.pool.submit(frame) if step == "detect" else None
+                    source.pending.append((frame, source.frame_buffer.last_captured_at, step, sequence))
+                    progressed = True
+            # With the pipeline full, wait for the oldest frame so capture order is kept
+            if self.finish_pending(source, wait=len(source.pending) >= in_flight):
+                progressed = True
+        return progressed
+
+    def finish_pending(self, source, wait=False, drain=False):
+        # Processes the source's frames whose results are in, waiting for the oldest one with
+        # `wait` and for all of them with `drain`; returns how many were processed
+        finished = 0
+        while source.pending:
+            frame, captured_at, step, sequence = source.pending[0]
+            detections = None
+            if sequence is not None:
+                if not wait and not self.pool.ready(sequence):
+                    break
+                start = time.perf_counter()
+                try:
+                    detections = self.pool.result(sequence, timeout=self.result_timeout)
+                except RuntimeError as e:
+                    if self.pool.error is not None:
+                        raise
+                    print(f"[{source.name}] Inference failed: {e}")  # This frame keeps the last detections
+                self.model_seconds += time.perf_counter() - start
+                self.batched_frames += 1
+                self.ticks += 1
+            source.pending.popleft()
+            source.process(frame, captured_at, detections, self.show, step)
+            finished += 1
+            wait = drain
+        return finished
+
+    def drain(self):
+        # Frames still waiting on the pool when the run stops
+        for source in self.sources:
+            try:
+                self.finish_pending(source, wait=True, drain=True)
+            except (RuntimeError, TimeoutError) as e:
+                print(f"[{source.name}] Dropping {len(source.pending)} frames still in flight: {e}")
+                for frame, _, _, _ in source.pending:
+                    self.frame_pool.release(frame)
+                source.pending.clear()
+
+    def run(self, seconds=0, stats_every=10.0):
+        for source in self.sources:
+            source.start()
+        deadline = time.monotonic() + seconds if seconds else None
+        next_stats = time.monotonic() + stats_every
+        try:
+            while not self.stop_flag.is_set() and self.sources:
+                if not self.tick():
+                    if all(source.capture_thread.finished.is_set() for source in self.sources):
+                        break  # Every stream has ended
+                    time.sleep(self.idle_sleep)
+                if self.show and cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                if deadline and time.monotonic() >= deadline:
+                    break
+                if time.monotonic() >= next_stats:
+                    self.print_stats()
+                    next_stats = time.monotonic() + stats_every
+        except KeyboardInterrupt:
+            print("Program stopped manually.")
+        finally:
+            if self.pool is not None:
+                self.drain()
+            for source in self.sources:
+                source.stop()
+            self.evidence_writer.close()
+            self.print_stats()
+            if self.pool is not None:
+                print(f"Inference workers: {self.pool.stats()}")
+                self.pool.close()
+            if self.show:
+                cv2.destroyAllWindows()
+
+    def print_stats(self):
+        for source in self.sources:
+            print(f"[{source.name}] {source.stats()}")  # Per-source frame rate and latency
+        average_batch = self.batched_frames / self.ticks if self.ticks else 0.0
+        average_call = 1000 * self.model_seconds / self.ticks if self.ticks else 0.0
+        print(f"Batched inference: {self.ticks} calls, {average_batch:.2f} frames per call, {average_call:.1f} ms per call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch several cameras with one batched model")
+    parser.add_argument("sources", nargs="+", help="Webcam indices, video files or stream URLs")
+    parser.add_argument("--output", default="multi_camera_output", help="Directory for per-camera snapshots and reports")
+    parser.add_argument("--model", default=model_path, help="YOLO weights shared by all cameras")
+    parser.add_argument("--backend", choices=backends, default="pytorch",
+                        help="Inference backend (exports without a dynamic batch size run one frame per call)")
+    parser.add_argument("--int8", action="store_true", help="Use the INT8-quantized export for onnx/openvino")
+    parser.add_argument("--seconds", type=float, default=0, help="Stop after this many seconds (default: run until stopped)")
+    parser.add_argument("--show", action="store_true", help="Show one preview window per camera")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this local port")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Run the model in this many processes fed through shared memory (default: in this process)")
+    parser.add_argument("--torch-threads", type=int, default=None, help="Torch threads per worker (default: cores / workers)")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        MetricsServer(args.metrics_port).start()
+
+    model, pool = None, None
+    if args.workers:
+        torch_threads = args.torch_threads or max(1, (os.cpu_count() or 1) // args.workers)
+        pool = InferencePool({"weights": args.model, "backend": args.backend, "int8": args.int8},
+                             workers=args.workers, torch_threads=torch_threads)
+        try:
+            pool.wait_ready()
+        except (RuntimeError, TimeoutError) as e:
+            print(f"Error: {e}")
+            pool.close()
+            return
+    else:
+        model = load_backend(args.backend, args.model, int8=args.int8)
+    MultiCameraRunner(args.sources, args.output, model, show=args.show, pool=pool).run(args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import time
+import cv2
+import numpy as np
+from blur import BackgroundBlur, blur_qualities
+from detection import detection_dtype, person_class, phone_class, empty_detections, boxes_of, make_detector
+from event_store import EventStore
+from evidence_writer import EvidenceWriter
+from frame_analyzer import FrameAnalyzer
+from frame_pool import FramePool
+from incidents import IncidentEngine
+from inference_backend import backends, load_backend
+from report import StreamingReportWriter
+
+stages = ["capture", "motion_gate", "inference", "postprocess", "blur", "annotate", "persist", "report"]
+default_scenes = ["1:0", "2:1", "4:2"]  # persons:phones of the synthetic scenes
+baseline_path = "benchmark_baselines.json"  # Versioned with the code, recorded on the machine named in each entry
+regression_threshold = 0.2  # Fail when a p50/p95 latency grows by more than this fraction
+noise_floor_ms = 0.5  # ...and by more than this many milliseconds, so sub-millisecond jitter never fails
+default_repeats = 5  # Runs per clip; their frames are pooled and their spread widens the tolerance
+default_warmup = 10  # Frames per run left out of the timings (caches, allocations, first-frame setup)
+
+
+class SyntheticScene:
+    # Deterministic scene with persons walking across a textured background, some holding
+    # a phone. The ground truth doubles as the detector output when no model is given.
+    def __init__(self, persons=2, phones=1, size=(1280, 720), seed=0):
+        self.persons = persons
+        self.phones = min(phones, persons)  # Phones are held by persons
+        self.width, self.height = size
+        rng = np.random.default_rng(seed)
+        self.background = cv2.GaussianBlur(rng.integers(0, 256, (self.height, self.width, 3), dtype=np.uint8), (9, 9), 0)
+        self.starts = rng.uniform(0, self.width, persons)
+        self.speeds = rng.uniform(4, 12, persons) * rng.choice([-1, 1], persons)
+
+    def detections(self, index):
+        person_width, person_height = self.width // 10, self.height // 2
+        span = self.width - person_width
+        rows = []
+        for i in range(self.persons):
+            x = int(abs((self.starts[i] + self.speeds[i] * index) % (2 * span) - span))  # Bounce between the edges
+            y = self.height // 3 + (i * 37) % (self.height // 8)
+            rows.append((x, y, x + person_width, y + person_height, 0.9, person_class))
+            if i < self.phones:
+                px, py = x + person_width // 2, y + person_height // 2
+                rows.append((px, py, px + person_width // 4, py + person_height // 6, 0.8, phone_class))
+        return np.array(rows, dtype=detection_dtype) if rows else empty_detections()
+
+    def frame(self, index):
+        frame = self.background.copy()
+        for x1, y1, x2, y2, _, cls in self.detections(index).tolist():
+            if cls == person_class:
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (150, 130, 120), -1)
+                cv2.circle(frame, ((x1 + x2) // 2, y1 - 25), 25, (170, 180, 200), -1)
+            else:
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (20, 20, 20), -1)
+        return frame
+
+
+def write_scene_clip(scene, path, frames, fps):
+    # Scenes are replayed from a file like recorded sessions, so capture includes decoding
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (scene.width, scene.height))
+    for i in range(frames):
+        writer.write(scene.frame(i))
+    writer.release()
+    return path
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {stage: [] for stage in stages}
+        self.frame_totals = []
+        self.frame_started = None
+        self.last = None
+
+    def start_frame(self):
+        self.frame_started = self.last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.samples[stage].append(now - self.last)
+        self.last = now
+
+    def end_frame(self):
+        self.frame_totals.append(self.last - self.frame_started)
+
+    def timed(self, warmup=0):
+        # Every stage is marked once per frame, so dropping the first `warmup` samples drops those frames
+        if len(self.frame_totals) <= warmup:
+            warmup = 0  # Too short a clip to leave anything out
+        samples = {stage: values[warmup:] for stage, values in self.samples.items()}
+        samples["frame"] = self.frame_totals[warmup:]
+        return samples
+
+
+def summarize(samples):
+    # p50/p95/p99 in milliseconds of each stage, and throughput from the frame totals
+    def percentiles(values):
+        values = 1000 * np.array(values) if values else np.zeros(1)
+        return {f"p{p}": round(float(np.percentile(values, p)), 3) for p in (50, 95, 99)}
+    summary = {stage: percentiles(values) for stage, values in samples.items()}
+    total = sum(samples["frame"])
+    summary["fps"] = round(len(samples["frame"]) / total, 2) if total else 0.0
+    return summary
+
+
+def run_clip(clip_path, detect, output_dir, blur_quality="medium", warmup=default_warmup):
+    # The detect_phone_and_humans() loop with a timer around each stage; gating, tracking and
+    # incident signals are the scripts' own FrameAnalyzer. Incidents are timed by frame
+    # position, so the same clip produces the same incidents at any speed.
+    # The first `warmup` frames are processed but not timed.
+    cap = cv2.VideoCapture(clip_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"failed to open {clip_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    clip_start = datetime.datetime(2000, 1, 1)
+    frame_pool = FramePool()
+    evidence_writer = EvidenceWriter(frame_pool=frame_pool)
+    snapshot_dir = os.path.join(output_dir, "snapshots")
+
+    def save_incident_frame(incident, frame, role):
+        image_path = evidence_writer.submit_frame(snapshot_dir, f"{role}_{incident.incident_id}", frame)
+        return [image_path] if image_path else []
+
+    incident_engine = IncidentEngine(save_incident_frame, frame_pool=frame_pool)
+    event_store = EventStore(os.path.join(output_dir, "events.db"))
+    report_writer = StreamingReportWriter(os.path.join(output_dir, "detection_log.pdf"), before_render=evidence_writer.flush)
+    session = f"benchmark@{datetime.datetime.now():%Y-%m-%d_%H-%M-%S}"
+    frame_analyzer = FrameAnalyzer()
+    person_tracker = frame_analyzer.person_tracker
+    background_blur = BackgroundBlur(blur_quality)
+    timer = StageTimer()
+    frame_index = 0
+    frame_shape = None
+
+    while True:
+        timer.start_frame()
+        buffer = frame_pool.acquire(frame_shape, stage="decode") if frame_shape else None
+        ret, frame = cap.read(buffer)
+        if not ret:
+            frame_pool.release(buffer)
+            break
+        if frame is not buffer:
+            frame_pool.release(buffer)
+            frame_pool.adopt(frame, stage="decode")
+            frame_shape = frame.shape
+        timer.mark("capture")
+
+        step = frame_analyzer.gate(frame)
+        moved = step is not None
+        timer.mark("motion_gate")
+        detections = detect(frame, frame_index) if step == "detect" else None
+        timer.mark("inference")
+
+        phones, confirmed_tracks, signals, boxes = frame_analyzer.apply(frame, step, detections, timer.samples["inference"][-1])
+        frame_height, frame_width = frame.shape[:2]
+        timer.mark("postprocess")
+
+        sharp_boxes = [tuple(box) for box in boxes_of(phones).astype(int).tolist()]
+        sharp_boxes += [track.clipped_box(frame_width, frame_height) for track in person_tracker.visible_tracks()]
+        blurred = frame_pool.acquire(frame.shape, frame.dtype, stage="blur")
+        background_blur.composite(frame, sharp_boxes, static=not moved, out=blurred)
+        timer.mark("blur")
+
+        for x1, y1, x2, y2, conf, _ in phones.tolist():
+            cv2.rectangle(blurred, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(blurred, f'cell phone {conf:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        for track in person_tracker.visible_tracks():
+            x1, y1, x2, y2 = track.clipped_box(frame_width, frame_height)
+            cv2.rectangle(blurred, (x1, y1), (x2, y2), (255, 0, 0), 2)
+            cv2.putText(blurred, f'Person {track.track_id} {track.confidence:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+        timer.mark("annotate")
+
+        frame_time = clip_start + datetime.timedelta(seconds=frame_index / fps)
+        events = [event_store.record_incident(session, incident)
+                  for incident in incident_engine.update(frame_time, signals, blurred, boxes)]
+        timer.mark("persist")
+
+        for event in events:
+            report_writer.add(event)
+        frame_pool.release(frame)
+        frame_pool.release(blurred)
+        timer.mark("report")
+        timer.end_frame()
+        frame_index += 1
+
+    cap.release()
+    finalize_start = time.perf_counter()
+    for incident in incident_engine.close_all():
+        report_writer.add(event_store.record_incident(session, incident))
+    report_writer.finalize()
+    evidence_writer.close()
+    event_store.close()
+    samples = timer.timed(warmup)
+    summary = summarize(samples)
+    summary["samples"] = samples  # Raw seconds per stage, pooled over repeats by run_repeats()
+    summary["frames"] = frame_index
+    summary["finalize_ms"] = round(1000 * (time.perf_counter() - finalize_start), 1)
+    summary["bytes_written"] = evidence_writer.stats()["bytes_written"]
+    return summary
+
+
+def run_repeats(clip_path, detect, output_dir, blur_quality="medium", repeats=default_repeats, warmup=default_warmup):
+    # Percentiles over the frames of all runs of the clip together, so a stall in one run is
+    # a few samples among many. The spread (max - min) of the per-run p50s, p95s and
+    # throughputs is kept as a measure of how noisy this machine is.
+    runs = [run_clip(clip_path, detect, output_dir, blur_quality, warmup) for _ in range(repeats)]
+    combined = summarize({stage: [v for run in runs for v in run["samples"][stage]] for stage in stages + ["frame"]})
+    for stage in stages + ["frame"]:
+        for p in ("p50", "p95"):
+            values = [run[stage][p] for run in runs]
+            combined[stage][f"{p}_spread"] = round(max(values) - min(values), 3)
+    fps = [run["fps"] for run in runs]
+    combined["fps_spread"] = round(max(fps) - min(fps), 2)
+    combined["finalize_ms"] = round(float(np.median([run["finalize_ms"] for run in runs])), 1)
+    combined["frames"] = runs[-1]["frames"]
+    combined["bytes_written"] = runs[-1]["bytes_written"]
+    combined["repeats"] = repeats
+    combined["machine"] = machine_name()
+    return combined
+
+
+def machine_name():
+    return f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs, Python {platform.python_version()}"
+
+
+def check_regressions(results, baselines, threshold=regression_threshold, noise_floor=noise_floor_ms):
+    # Compare the p50 and p95 of every stage and of the whole frame, plus throughput, with the
+    # baseline. A change only counts if it exceeds the relative threshold, the noise floor and
+    # the run-to-run spread seen in the baseline and in this run together.
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        for stage in stages + ["frame"]:
+            if stage not in baseline:
+                continue  # Stage added after the baseline was stored
+            for p in ("p50", "p95"):
+                old, new = baseline[stage][p], result[stage][p]
+                noise = max(noise_floor, baseline[stage].get(f"{p}_spread", 0.0) + result[stage].get(f"{p}_spread", 0.0))
+                if new > old * (1 + threshold) and new - old > noise:
+                    regressions.append(f"{name}: {stage} {p} {old:.2f} -> {new:.2f} ms")
+        old, new = baseline["fps"], result["fps"]
+        if new < old / (1 + threshold) and old - new > baseline.get("fps_spread", 0.0) + result.get("fps_spread", 0.0):
+            regressions.append(f"{name}: throughput {old:.1f} -> {new:.1f} frames/s")
+    return regressions
+
+
+def print_result(name, result):
+    print(f"{name}: {result['frames']} frames, {result['fps']:.1f} frames/s (over {result['repeats']} runs), "
+          f"finalize {result['finalize_ms']:.0f} ms")
+    for stage in stages + ["frame"]:
+        latency = result[stage]
+        print(f"  {stage:>11}: p50 {latency['p50']:8.2f}  p95 {latency['p95']:8.2f}  p99 {latency['p99']:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every stage of the detection pipeline on fixed clips")
+    parser.add_argument("clips", nargs="*", help="Recorded clips to replay (need --model)")
+    parser.add_argument("--scene", action="append", default=None,
+                        help=f"Synthetic scene as PERSONS:PHONES, repeatable (default: {' '.join(default_scenes)})")
+    parser.add_argument("--frames", type=int, default=150, help="Frames per synthetic scene")
+    parser.add_argument("--fps", type=float, default=15, help="Frame rate of the synthetic scenes")
+    parser.add_argument("--size", default="1280x720", help="Synthetic frame size")
+    parser.add_argument("--model", default=None,
+                        help="YOLO weights; without them synthetic scenes use their ground truth as detections")
+    parser.add_argument("--backend", choices=backends, default="pytorch")
+    parser.add_argument("--blur-quality", choices=blur_qualities, default="medium")
+    parser.add_argument("--output", default="benchmark_output", help="Directory for clips, evidence and reports")
+    parser.add_argument("--baselines", default=baseline_path, help="JSON file with the stored baselines")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baselines")
+    parser.add_argument("--threshold", type=float, default=regression_threshold, help="Allowed p50/p95 growth before failing")
+    parser.add_argument("--repeats", type=int, default=default_repeats, help="Runs per clip, their frames timed together")
+    parser.add_argument("--warmup", type=int, default=default_warmup, help="Frames per run left out of the timings")
+    args = parser.parse_args()
+
+    if args.clips and not args.model:
+        parser.error("recorded clips have no ground truth, pass --model")
+    model_detect = None
+    if args.model:
+        detector = make_detector(load_backend(args.backend, args.model))
+        model_detect = lambda frame, index: detector(frame, verbose=False)
+
+    width, height = (int(v) for v in args.size.split("x"))
+    runs = []
+    for spec in args.scene or ([] if args.clips else default_scenes):
+        persons, phones = (int(v) for v in spec.split(":"))
+        name = f"scene_{persons}p{phones}f_{width}x{height}_{args.frames}frames"
+        scene = SyntheticScene(persons, phones, (width, height))
+        clip = write_scene_clip(scene, os.path.join(args.output, "clips", name + ".mp4"), args.frames, args.fps)
+        runs.append((name, clip, model_detect or (lambda frame, index, scene=scene: scene.detections(index))))
+    for clip in args.clips:
+        runs.append((os.path.splitext(os.path.basename(clip))[0], clip, model_detect))
+
+    results = {}
+    for name, clip, detect in runs:
+        # Runs only compare with a baseline of the same clip, frame count, size, repeats and warmup
+        key = f"{name}@{args.repeats}runs_{args.warmup}warmup"
+        results[key] = run_repeats(clip, detect, os.path.join(args.output, name), args.blur_quality, args.repeats, args.warmup)
+        print_result(key, results[key])
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baselines saved to {args.baselines}")
+        return
+
+    for name in results:
+        if name in baselines and baselines[name].get("machine") != machine_name():
+            print(f"Note: the {name} baseline was recorded on {baselines[name].get('machine', 'an unknown machine')}")
+    regressions = check_regressions(results, baselines, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        raise SystemExit(1)
+    compared = sum(name in baselines for name in results)
+    print(f"No regressions ({compared} of {len(results)} runs had a baseline)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+
+boundary = "frame"
+
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        preview = self.server.preview
+        if self.path not in ("/", "/stream.mjpg"):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={boundary}")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        preview.add_viewer()
+        try:
+            sequence = 0
+            while not preview.stopped:
+                jpeg, sequence = preview.wait_for_frame(sequence, timeout=1.0)
+                if jpeg is None:
+                    continue
+                self.wfile.write(f"--{boundary}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode())
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Viewer closed the page
+        finally:
+            preview.remove_viewer()
+
+    def log_message(self, format, *args):
+        pass  # Keep request logs out of the detection output
+
+
+class PreviewServer:
+    # Local MJPEG preview for headless runs, e.g. http://127.0.0.1:8090/ in a browser.
+    # Frames are only encoded while someone is watching, and at most `max_fps` times a second.
+    def __init__(self, port=8090, host="127.0.0.1", max_fps=5, quality=70, scale_width=640):
+        self.host = host
+        self.port = port
+        self.max_fps = max_fps
+        self.quality = quality
+        self.scale_width = scale_width
+        self.condition = threading.Condition()
+        self.viewers = 0
+        self.jpeg = None
+        self.sequence = 0
+        self.last_published = 0.0
+        self.published = 0
+        self.stopped = False
+        self.server = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), PreviewHandler)
+        self.server.daemon_threads = True
+        self.server.preview = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Preview available at http://{self.host}:{self.port}/")
+
+    def stop(self):
+        self.stopped = True
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def add_viewer(self):
+        with self.condition:
+            self.viewers += 1
+
+    def remove_viewer(self):
+        with self.condition:
+            self.viewers -= 1
+
+    def wants_frame(self):
+        # True when a viewer is connected and the rate limit allows another frame
+        return self.viewers > 0 and time.monotonic() - self.last_published >= 1.0 / self.max_fps
+
+    def publish(self, frame):
+        self.last_published = time.monotonic()
+        height, width = frame.shape[:2]
+        if width > self.scale_width:
+            frame = cv2.resize(frame, (self.scale_width, int(height * self.scale_width / width)), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        with self.condition:
+            self.jpeg = encoded.tobytes()
+            self.sequence += 1
+            self.published += 1
+            self.condition.notify_all()
+
+    def wait_for_frame(self, last_sequence, timeout=None):
+        # Newest JPEG after `last_sequence`, or (None, last_sequence) on timeout
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.sequence > last_sequence or self.stopped, timeout):
+                return None, last_sequence
+            return self.jpeg, self.sequence
+
+    def stats(self):
+        with self.condition:
+            return {"viewers": self.viewers, "published": self.published}
@@ -0,0 +1,314 @@
+import glob
+import io
+import os
+import queue
+import shutil
+import threading
+import time
+from clip_recorder import is_clip, thumbnail_path
+from metrics import queue_depth, bytes_written, write_seconds
+
+image_width = 180
+image_height = 90
+margin = 10
+
+
+def new_pdf(with_title=True):
+    from fpdf import FPDF  # Imported on first use, startup never needs it
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    if with_title:
+        pdf.cell(200, 10, txt="Detection Log", ln=True, align="C")
+        pdf.ln(10)  # Line break
+    return pdf
+
+
+def render_events(pdf, events):
+    # `events` are event_store.Event records, alerts are highlighted in red
+    for event in events:
+        if event.is_alert():
+            pdf.set_text_color(255, 0, 0)
+        else:
+            pdf.set_text_color(0, 0, 0)
+        pdf.cell(200, 10, txt=event.describe(), ln=True, align="L")
+
+        if event.evidence_paths:
+            for image_path in event.evidence_paths:
+                link = ""
+                if is_clip(image_path):
+                    # Clips are shown as their thumbnail, linked to the video file
+                    link = "file:///" + os.path.abspath(image_path).replace(os.sep, "/").lstrip("/")
+                    pdf.set_text_color(0, 0, 255)
+                    pdf.cell(200, 8, txt=f"Clip: {os.path.basename(image_path)}", ln=True, align="L", link=link)
+                    image_path = thumbnail_path(image_path)
+                pdf.ln(5)
+
+                # Start a new page if the image would run over the bottom margin
+                if pdf.get_y() + image_height + margin > pdf.h - pdf.b_margin:
+                    pdf.add_page()
+
+                y_position = pdf.get_y()
+                try:
+                    pdf.image(image_path, x=10, y=y_position, w=image_width, h=image_height, link=link)
+                except (RuntimeError, OSError) as e:
+                    print(f"Error adding image to PDF: {e}")
+                pdf.set_y(y_position + image_height + margin)
+        else:
+            pdf.ln(10)
+
+
+def create_pdf(events, pdf_path):
+    # Typically called with the result of EventStore.query()
+    os.makedirs(os.path.dirname(pdf_path) or ".", exist_ok=True)
+
+    start = time.perf_counter()
+    pdf = new_pdf()
+    render_events(pdf, events)
+    pdf.output(pdf_path)
+    bytes_written.inc(os.path.getsize(pdf_path), kind="report")
+    write_seconds.observe(time.perf_counter() - start, kind="create_pdf")
+    print(f"Detection log saved at: {pdf_path}")  # Print the log location
+    return pdf_path
+
+
+class PdfAppender:
+    # Appends PDF segments to an existing PDF as incremental updates: each segment's objects,
+    # the extended page tree and a new cross-reference section go to the end of the file,
+    # which is never rewritten. The trailer and page tree are read once and then kept here,
+    # so an append costs the same however long the report has grown. Expects the flat page
+    # tree fpdf writes.
+    def __init__(self, pdf_path):
+        from PyPDF2 import PdfReader
+        from PyPDF2.generic import DictionaryObject, NameObject, NumberObject
+
+        self.pdf_path = pdf_path
+        with open(pdf_path, "rb") as f:
+            report = PdfReader(f)
+            self.pages_ref = report.trailer["/Root"].raw_get("/Pages")
+            self.pages = report.trailer["/Root"]["/Pages"]
+            self.size = report.trailer["/Size"]  # Next free object number
+            self.trailer = DictionaryObject({NameObject("/Root"): report.trailer.raw_get("/Root")})
+            if "/Info" in report.trailer:
+                self.trailer[NameObject("/Info")] = report.trailer.raw_get("/Info")
+            self.end = f.seek(0, os.SEEK_END)
+            f.seek(max(0, self.end - 1024))
+            tail = f.read()
+        self.trailer[NameObject("/Prev")] = NumberObject(int(tail[tail.rindex(b"startxref") + 9:].split()[0]))
+
+    def append(self, segment_path):
+        # Returns the number of bytes appended
+        from PyPDF2 import PdfReader
+        from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+
+        segment = PdfReader(segment_path)
+        numbers = {}  # Object number in the segment -> number in the report
+        objects = {}  # Number in the report -> object to write
+
+        def renumber(obj):
+            if isinstance(obj, IndirectObject):
+                if obj.idnum not in numbers:
+                    numbers[obj.idnum] = number = self.size + len(numbers)
+                    objects[number] = renumber(obj.get_object())
+                return IndirectObject(numbers[obj.idnum], 0, None)
+            if isinstance(obj, DictionaryObject):
+                for key, value in list(obj.items()):
+                    obj[key] = renumber(value)
+            elif isinstance(obj, ArrayObject):
+                for i, value in enumerate(obj):
+                    obj[i] = renumber(value)
+            return obj
+
+        new_pages = []
+        for page in segment.pages:  # Inherited attributes such as /MediaBox are copied onto each page
+            del page["/Parent"]  # Would pull in the segment's own page tree
+            new_pages.append(renumber(page.indirect_reference))
+            objects[new_pages[-1].idnum][NameObject("/Parent")] = self.pages_ref
+        self.pages[NameObject("/Kids")] = ArrayObject(list(self.pages.raw_get("/Kids")) + new_pages)
+        self.pages[NameObject("/Count")] = NumberObject(self.pages["/Count"] + len(new_pages))
+        objects[self.pages_ref.idnum] = self.pages
+        self.size += len(numbers)
+        self.trailer[NameObject("/Size")] = NumberObject(self.size)
+
+        update = io.BytesIO()
+        update.write(b"\n")
+        offsets = {}
+        for number, obj in objects.items():
+            offsets[number] = self.end + update.tell()
+            update.write(f"{number} 0 obj\n".encode())
+            obj.write_to_stream(update, None)
+            update.write(b"\nendobj\n")
+        xref_offset = self.end + update.tell()
+        update.write(b"xref\n0 1\n0000000000 65535 f \n")  # Head of the free list, as in the original table
+        numbers = sorted(offsets)
+        while numbers:
+            run = 1
+            while run < len(numbers) and numbers[run] == numbers[0] + run:
+                run += 1
+            update.write(f"{numbers[0]} {run}\n".encode())
+            for number in numbers[:run]:
+                update.write(f"{offsets[number]:010d} 00000 n \n".encode())  # Fixed 20-byte entries
+            numbers = numbers[run:]
+        update.write(b"trailer\n")
+        self.trailer.write_to_stream(update, None)
+        update.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        with open(self.pdf_path, "ab") as f:
+            f.write(update.getvalue())
+        self.end += update.tell()
+        self.trailer[NameObject("/Prev")] = NumberObject(xref_offset)
+        return update.tell()
+
+
+class StreamingReportWriter:
+    # Builds the report while the session runs instead of all at once at the end. Events are
+    # rendered in small PDF segments on a background thread, and every checkpoint flushes the
+    # pending events into a segment, so a crash loses at most one checkpoint interval. Each
+    # segment is appended to a running report in the parts directory as soon as it is
+    # written, so finalize() only renders the last few events and moves the report into
+    # place: neither memory nor finalize time grows with the length of the session.
+    # A session that never reached finalize() is recovered into
+    # "<name>_recovered_<time of its last write>.pdf" before its parts are cleared.
+    # `before_render` is called before each segment, e.g. to wait for queued evidence images.
+    def __init__(self, pdf_path, entries_per_segment=5, checkpoint_interval=30.0, before_render=None):
+        self.pdf_path = pdf_path
+        self.parts_dir = pdf_path + ".parts"
+        self.report_path = os.path.join(self.parts_dir, "report.pdf")  # The running report
+        self.progress_path = self.report_path + ".progress"  # "<last segment appended> <report bytes>"
+        self.entries_per_segment = entries_per_segment
+        self.checkpoint_interval = checkpoint_interval
+        self.before_render = before_render
+        self.entries = queue.Queue()
+        self.appender = None  # PdfAppender of the running report, from the second segment on
+        self.segments = 0
+        self.merged = False  # True once the report is at pdf_path
+        self.entries_written = 0
+        self.checkpoints = 0
+        self.finalized = False
+        self.finished = threading.Event()
+
+        self.recover()
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        os.makedirs(self.parts_dir, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def recover(self):
+        # The running report up to its last complete append, plus the segments written after it
+        leftovers = sorted(glob.glob(os.path.join(self.parts_dir, "part_*.pdf")))
+        appended, size = -1, 0
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path) as f:
+                appended, size = (int(v) for v in f.read().split())
+        leftovers = [path for path in leftovers if int(os.path.basename(path)[5:10]) > appended]
+        if appended < 0 and not leftovers:
+            return
+        stamp = max(os.path.getmtime(path) for path in leftovers + ([self.progress_path] if appended >= 0 else []))
+        base = f"{os.path.splitext(self.pdf_path)[0]}_recovered_{time.strftime('%Y-%m-%d_%H-%M-%S', time.localtime(stamp))}"
+        recovered_path, copies = base + ".pdf", 1
+        while os.path.exists(recovered_path):  # Never overwrite an earlier recovery
+            copies += 1
+            recovered_path = f"{base}_{copies}.pdf"
+        temp_path = recovered_path + ".tmp"
+        try:
+            if appended >= 0:
+                shutil.copyfile(self.report_path, temp_path)
+                os.truncate(temp_path, size)  # Drops an append cut short by the crash
+            appender = None
+            for segment_path in leftovers:
+                if not os.path.exists(temp_path):
+                    shutil.copyfile(segment_path, temp_path)
+                    continue
+                appender = appender or PdfAppender(temp_path)
+                appender.append(segment_path)
+            os.replace(temp_path, recovered_path)
+            print(f"Report of an interrupted session recovered at: {recovered_path}")
+        except Exception as e:
+            print(f"Failed to recover the report of an interrupted session: {e}")
+
+    def add(self, event):
+        if self.finalized:
+            print(f"Report already finalized, dropping event: {event.describe()}")
+            return
+        self.entries.put(event)
+        queue_depth.set(self.entries.qsize(), queue="report")
+
+    def run(self):
+        try:
+            self.stream()
+        finally:
+            self.finished.set()  # Never leave finalize() waiting, even if rendering failed
+
+    def stream(self):
+        pending = []
+        next_checkpoint = time.monotonic() + self.checkpoint_interval
+        while True:
+            try:
+                entry = self.entries.get(timeout=max(0.0, next_checkpoint - time.monotonic()))
+            except queue.Empty:
+                entry = False  # Checkpoint timer expired
+            queue_depth.set(self.entries.qsize(), queue="report")
+            if entry is None:
+                break  # finalize() was called
+
+            if entry:
+                pending.append(entry)
+            checkpoint_due = time.monotonic() >= next_checkpoint
+            if len(pending) >= self.entries_per_segment or (checkpoint_due and pending):
+                self.write_segment(pending)
+                pending = []
+            if checkpoint_due:
+                self.checkpoints += 1
+                next_checkpoint = time.monotonic() + self.checkpoint_interval
+
+        if pending or not self.segments:
+            self.write_segment(pending)  # Always leave at least the title page
+        os.replace(self.report_path, self.pdf_path)
+        self.merged = True
+
+    def write_segment(self, entries):
+        if self.before_render is not None:
+            self.before_render()
+        start = time.perf_counter()
+        pdf = new_pdf(with_title=not self.segments)
+        render_events(pdf, entries)
+        segment_path = os.path.join(self.parts_dir, f"part_{self.segments:05d}.pdf")
+        pdf.output(segment_path + ".tmp")
+        os.replace(segment_path + ".tmp", segment_path)  # A crash never leaves a half-written segment
+        bytes_written.inc(os.path.getsize(segment_path), kind="report_segment")
+        write_seconds.observe(time.perf_counter() - start, kind="report_segment")
+        self.append_segment(segment_path)
+        self.segments += 1
+        self.entries_written += len(entries)
+
+    def append_segment(self, segment_path):
+        start = time.perf_counter()
+        if self.appender is None:
+            shutil.copyfile(segment_path, self.report_path)  # The title segment starts the report
+            bytes_written.inc(os.path.getsize(self.report_path), kind="report")
+            self.appender = PdfAppender(self.report_path)
+        else:
+            bytes_written.inc(self.appender.append(segment_path), kind="report")
+        with open(self.progress_path + ".tmp", "w") as f:
+            f.write(f"{self.segments} {self.appender.end}")
+        os.replace(self.progress_path + ".tmp", self.progress_path)
+        os.remove(segment_path)  # Its pages are in the report now
+        write_seconds.observe(time.perf_counter() - start, kind="report_append")
+
+    def finalize(self, timeout=None):
+        # Render whatever is still pending, move the report into place and clean up its parts
+        if not self.finalized:
+            self.finalized = True
+            self.entries.put(None)
+        if self.finished.wait(timeout) and self.merged:
+            shutil.rmtree(self.parts_dir, ignore_errors=True)
+        print(f"Detection log saved at: {self.pdf_path}")  # Print the log location
+        return self.pdf_path
+
+    def stats(self):
+        return {
+            "entries_written": self.entries_written,
+            "segments": self.segments,
+            "checkpoints": self.checkpoints,
+            "pending": self.entries.qsize(),
+        }
@@ -0,0 +1,136 @@
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class PyAutoGUIBackend:
+    def grab(self):
+        import pyautogui
+        return cv2.cvtColor(np.asarray(pyautogui.screenshot()), cv2.COLOR_RGB2BGR)
+
+
+class FakeScreenBackend:
+    # Synthetic desktop for headless runs and tests: a window that moves every `change_every` grabs
+    def __init__(self, size=(1280, 720), change_every=5):
+        self.size = size
+        self.change_every = change_every
+        self.grabs = 0
+
+    def grab(self):
+        width, height = self.size
+        step = self.grabs // self.change_every
+        self.grabs += 1
+        frame = np.full((height, width, 3), 90, dtype=np.uint8)
+        x, y = 40 + (step * 97) % (width - 400), 40 + (step * 53) % (height - 300)
+        cv2.rectangle(frame, (x, y), (x + 360, y + 260), (235, 235, 235), -1)
+        cv2.putText(frame, f"Window {step}", (x + 20, y + 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (30, 30, 30), 2)
+        return frame
+
+
+screen_backends = {"pyautogui": PyAutoGUIBackend, "fake": FakeScreenBackend}
+
+
+def make_screen_backend(name):
+    if name not in screen_backends:
+        raise ValueError(f"Unknown screen backend: {name} (expected one of {', '.join(screen_backends)})")
+    return screen_backends[name]()
+
+
+def screen_thumbnail(image, width=480):
+    # Grey thumbnail still fine enough for a line of changed text to move many of its pixels
+    # (a small perceptual hash averages text away)
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    height = max(1, int(image.shape[0] * width / image.shape[1]))
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def changed_fraction(thumbnail, reference, pixel_delta=24):
+    # Fraction of thumbnail pixels whose grey level moved by more than `pixel_delta`
+    if reference is None or reference.shape != thumbnail.shape:
+        return 1.0
+    return np.count_nonzero(cv2.absdiff(thumbnail, reference) > pixel_delta) / thumbnail.size
+
+
+class ScreenCapture:
+    # Screen evidence without grabbing on the detection thread. A background thread grabs and
+    # downscales the screen at most every `interval` seconds while a session runs. capture()
+    # stores the latest grab only if more than `min_changed` of its thumbnail pixels differ
+    # from the last stored image, and otherwise returns the path of that existing image.
+    def __init__(self, backend, evidence_writer, interval=2.0, scale_width=960, thumbnail_width=480, min_changed=0.0002):
+        self.backend = backend
+        self.evidence_writer = evidence_writer
+        self.interval = interval
+        self.scale_width = scale_width
+        self.thumbnail_width = thumbnail_width  # Width of the grey thumbnail screens are compared on
+        self.min_changed = min_changed  # Fraction of thumbnail pixels that must change, a few characters of 1080p text
+        self.lock = threading.Lock()
+        self.stop_flag = threading.Event()
+        self.thread = None
+        self.latest = None  # (downscaled screen, thumbnail) of the last grab
+        self.stored_path = None
+        self.stored_thumbnail = None
+        self.grabs = 0
+        self.stored = 0
+        self.reused = 0
+        self.grab_seconds = 0.0
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_flag.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_flag.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        self.thread = None
+
+    def run(self):
+        while not self.stop_flag.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Screen capture failed: {e}")
+            self.stop_flag.wait(self.interval)
+
+    def sample(self):
+        start = time.perf_counter()
+        screen = self.backend.grab()
+        height, width = screen.shape[:2]
+        if width > self.scale_width:
+            screen = cv2.resize(screen, (self.scale_width, int(height * self.scale_width / width)), interpolation=cv2.INTER_AREA)
+        thumbnail = screen_thumbnail(screen, self.thumbnail_width)
+        with self.lock:
+            self.latest = (screen, thumbnail)
+            self.grabs += 1
+            self.grab_seconds += time.perf_counter() - start
+
+    def capture(self, directory, name):
+        # Path of an image showing the current screen; only written if the screen changed
+        if self.latest is None:
+            self.sample()  # Nothing grabbed yet in this session
+        with self.lock:
+            screen, thumbnail = self.latest
+            if changed_fraction(thumbnail, self.stored_thumbnail) <= self.min_changed:
+                self.reused += 1
+                return self.stored_path
+
+        path = self.evidence_writer.submit_frame(directory, name, screen)  # Each grab is a new array, safe to hand over
+        if path:
+            with self.lock:
+                self.stored_path, self.stored_thumbnail = path, thumbnail
+                self.stored += 1
+        return path
+
+    def stats(self):
+        with self.lock:
+            return {
+                "grabs": self.grabs,
+                "stored": self.stored,
+                "reused": self.reused,
+                "average_grab_ms": round(1000 * self.grab_seconds / self.grabs, 1) if self.grabs else 0.0,
+            }
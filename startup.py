@@ -0,0 +1,175 @@
+import threading
+import time
+import numpy as np
+from detection import set_input_size, warm_up
+from metrics import registry
+
+startup_seconds = registry.gauge("startup_seconds", "Seconds from startup to each milestone")
+first_detection_seconds = registry.histogram("first_detection_seconds", "Seconds from a session start to its first detection")
+
+
+class StartupTimeline:
+    # Milestones since the scripts started, and the time from each session start to its
+    # first detection (the delay a user actually notices)
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.marks = {}
+        self.session_started_at = None
+        self.first_detections = []
+
+    def mark(self, name):
+        if name in self.marks:
+            return
+        self.marks[name] = time.perf_counter() - self.started_at
+        startup_seconds.set(self.marks[name], milestone=name)
+        print(f"Startup: {name} after {self.marks[name]:.2f}s")
+
+    def session_started(self):
+        self.session_started_at = time.perf_counter()
+
+    def detection_done(self):
+        # Called after every model call; only the first one of a session is recorded
+        if self.session_started_at is None:
+            return
+        latency = time.perf_counter() - self.session_started_at
+        self.session_started_at = None
+        self.first_detections.append(latency)
+        first_detection_seconds.observe(latency)
+        self.mark("first_detection")
+        print(f"Time to first detection: {latency:.2f}s")
+
+    def stats(self):
+        return {
+            "milestones": {name: round(seconds, 2) for name, seconds in self.marks.items()},
+            "first_detection_seconds": [round(seconds, 2) for seconds in self.first_detections],
+        }
+
+
+class LazyDetector:
+    # Builds the detector on a background thread, so torch and ultralytics are imported and
+    # the weights loaded while the watcher and camera start. A dummy inference warms the
+    # model up (memory allocation, kernel selection) before the first real frame arrives.
+    # Calls made before it is ready wait for it.
+    def __init__(self, build, warmup_shape=(480, 640, 3), timeline=None):
+        self.build = build
+        self.warmup_shape = warmup_shape
+        self.timeline = timeline
+        self.lock = threading.Lock()
+        self.detector = None
+        self.imgsz = None  # Last input size asked for with set_input_size()
+        self.error = None
+        self.ready = threading.Event()
+        self.ready_at = None  # time.monotonic() once loaded and warmed up
+        self.load_seconds = 0.0
+        self.warmup_seconds = 0.0
+        threading.Thread(target=self.load, daemon=True).start()
+
+    def load(self):
+        try:
+            start = time.perf_counter()
+            detector = self.build()
+            self.load_seconds = time.perf_counter() - start
+            with self.lock:
+                self.detector = detector
+                if self.imgsz is not None:
+                    set_input_size(detector, self.imgsz)  # Asked for while the model was loading
+            start = time.perf_counter()
+            warm_up(detector, np.zeros(self.warmup_shape, dtype=np.uint8))
+            self.warmup_seconds = time.perf_counter() - start
+            self.ready_at = time.monotonic()
+            if self.timeline is not None:
+                self.timeline.mark("model_ready")
+        except Exception as e:
+            self.error = e
+            print(f"Failed to load the detector: {e}")
+        finally:
+            self.ready.set()
+
+    def wait(self, timeout=None):
+        if not self.ready.wait(timeout):
+            return False
+        if self.error is not None:
+            raise RuntimeError("detector failed to load") from self.error
+        return True
+
+    def set_input_size(self, imgsz):
+        # Applied right away once the model is built, otherwise as soon as it is
+        with self.lock:
+            self.imgsz = imgsz
+            if self.detector is not None:
+                set_input_size(self.detector, imgsz)
+
+    def __call__(self, frame, **kwargs):
+        if not self.ready.is_set():
+            print("Waiting for the model to finish loading...")
+        self.wait()
+        return self.detector(frame, **kwargs)
+
+    def stats(self):
+        stats = {"load_seconds": round(self.load_seconds, 2), "warmup_seconds": round(self.warmup_seconds, 2)}
+        if hasattr(self.detector, "stats"):
+            stats.update(self.detector.stats())
+        return stats
+
+
+class CameraPrimer:
+    # Opens the camera on a background thread at startup, so a session can start reading
+    # right away instead of waiting for the device to open. With `keep_open`, the device
+    # stays open between sessions; otherwise it is released and reopened on the next take().
+    def __init__(self, open_camera, keep_open=True, timeline=None):
+        self.open_camera = open_camera
+        self.keep_open = keep_open
+        self.timeline = timeline
+        self.lock = threading.Lock()
+        self.cap = None
+        self.priming = None
+        self.opens = 0
+        self.ready_takes = 0  # Sessions that found the camera already open
+
+    def prime(self):
+        self.priming = threading.Thread(target=self.open, daemon=True)
+        self.priming.start()
+
+    def open(self):
+        with self.lock:
+            if self.cap is not None and self.cap.isOpened():
+                return
+            self.cap = self.open_camera()
+            self.opens += 1
+            if self.cap.isOpened() and self.timeline is not None:
+                self.timeline.mark("camera_open")
+
+    def take(self):
+        # An opened capture, or None if the camera can't be opened
+        if self.priming is not None:
+            self.priming.join()  # Still opening in the background
+        with self.lock:
+            if self.cap is not None and self.cap.isOpened():
+                self.ready_takes += 1
+        self.open()
+        with self.lock:
+            cap, self.cap = self.cap, None
+        if cap is None or not cap.isOpened():
+            return None
+        return cap
+
+    def give_back(self, cap):
+        if cap is None:
+            return
+        if not self.keep_open:
+            cap.release()
+            return
+        with self.lock:
+            if self.cap is None:
+                self.cap = cap
+                return
+        cap.release()  # Already holding another capture
+
+    def close(self):
+        with self.lock:
+            if self.cap is not None:
+                self.cap.release()
+                self.cap = None
+
+    def stats(self):
+        return {"opens": self.opens, "ready_takes": self.ready_takes}
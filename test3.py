@@ -1,192 +1,385 @@
 import time
 import cv2
-import pygetwindow as gw
 import threading
 import os
 import datetime
-import pyautogui
-from ultralytics import YOLO
-from fpdf import FPDF
-from PyPDF2 import PdfWriter
+from frame_buffer import FrameRingBuffer, CaptureThread
+from frame_pool import FramePool
+from motion_gate import MotionGate
+from frame_analyzer import FrameAnalyzer
+from tracker import PersonTracker
+from inference_backend import load_backend
+from detection import make_detector, CascadeDetector, set_input_size
+from evidence_writer import EvidenceWriter
+from clip_recorder import ClipRecorder
+from screen_capture import ScreenCapture, make_screen_backend
+from incidents import IncidentEngine
+from report import StreamingReportWriter
+from event_store import EventStore
+from preview_server import PreviewServer
+from window_watcher import WindowWatcher, make_window_backend
+from metrics import MetricsServer, MetricsDumper, frames_processed, frame_seconds
+from startup import StartupTimeline, LazyDetector, CameraPrimer
+from latency_controller import LatencyController, degradation_ladder
+from blur import BackgroundBlur
+from inference_pool import InferencePool
 
 target_title_substr = "LinkedIn"  # Adjust this to a substring of the window title
-stop_flag = threading.Event()  # Create a threading event for stopping
+window_backend = "pygetwindow"  # "fake" simulates a window that gains and loses focus, e.g. on Linux
+window_poll_interval = 0.5  # Seconds between window checks
+window_debounce = 1.0  # Seconds a focus change must last before the webcam starts or stops
+stop_flag = threading.Event()  # Stop event of the current session; each session gets its own
 cap = None  # Initialize the webcam variable globally
+detection_thread = None  # Detection thread of the current session
+watcher = None  # Window watcher driving the sessions
 cap_lock = threading.Lock()  # Lock for thread-safe access to cap
-detection_entries = []
+report_writer = None  # Streams the report of the current webcam session
+session_id = None  # Tags this session's events in the event store
 output_dir = r"C:\Users\vipas\Phone-detection\output"  # Specify your desired directory
 snapshot_dir = os.path.join(output_dir, "snapshots")  # Directory for saving snapshots
 pdf_path = os.path.join(output_dir, "detection_log.pdf")  # Path for the PDF file
-last_saved_second = None
+event_db_path = os.path.join(output_dir, "events.db")  # Append-only SQLite log of every incident
+frame_buffer_size = 2  # Number of recent frames kept by the capture thread
+headless = False  # Skip every GUI call so no display is needed, e.g. on servers
+preview_port = None  # e.g. 8090 to serve an MJPEG preview at http://127.0.0.1:8090/
+preview_fps = 5  # Frame rate cap of the preview
+metrics_port = None  # e.g. 9100 to serve Prometheus metrics at http://127.0.0.1:9100/metrics
+metrics_dump_path = None  # e.g. "metrics.json" for a periodic JSON snapshot of the same metrics
+metrics_dump_interval = 30  # Seconds between JSON snapshots
+motion_threshold = 0.01  # Fraction of changed pixels that triggers a new inference
+motion_force_every = 30  # Re-run the model at least every N frames even if nothing moves
+detect_every = 5  # Run the detector every N moving frames and track persons in between
+inference_backend = "pytorch"  # pytorch, onnx or openvino (exported on first use)
+use_int8 = False  # Use the INT8-quantized export for onnx/openvino
+two_stage_phones = True  # Low-res person pass, then a high-res phone pass on crops around each person
+person_imgsz = 320  # Input size of the full-frame person pass (onnx/openvino always run at their export size)
+phone_crop_imgsz = 640  # Input size of the batched phone pass on person crops
+cascade_models = True  # Run the nano model first and escalate uncertain frames to the medium model
+fast_weights = 'yolov8n.pt'  # First stage of the cascade
+escalation_band = (0.3, 0.7)  # Phone confidences the nano model is unsure about
+inference_workers = 0  # e.g. 2 to run the detector in that many worker processes, so inference never holds this process's GIL
+latency_budget = 0.25  # Seconds from capture to a finished frame; above it quality is lowered step by step (None to disable)
+latency_log_path = os.path.join(output_dir, "latency_decisions.jsonl")  # Audit log of every quality change
+blur_quality = "medium"  # exact, high, medium or low; run blur.py to compare them
 manual_stop = False  # Flag to track manual stop
 
-# Load YOLO model
-model = YOLO('yolov8m.pt')  # Choose the appropriate model size
-
-def create_pdf(detections, pdf_path):
-    # Remove the existing PDF file if it exists
-    if os.path.exists(pdf_path):
-        os.remove(pdf_path)
-    
-    pdf_writer = PdfWriter()
-
-    # Add new content to the PDF
-    pdf_temp = FPDF()
-    pdf_temp.add_page()
-    pdf_temp.set_font("Arial", size=12)
-    pdf_temp.cell(200, 10, txt="Detection Log", ln=True, align="C")
-    pdf_temp.ln(10)  # Line break
-
-    image_width = 180
-    image_height = 90
-    page_height = pdf_temp.h - 20  # Reduce margin from the page height to avoid printing over the bottom margin
-
-    for entry in detections:
-        timestamp, image_paths = entry
-        pdf_temp.set_text_color(255, 0, 0)
-        pdf_temp.cell(200, 10, txt=timestamp, ln=True, align="L")
-        pdf_temp.ln(5)  # Add space below the timestamp
-
-        for image_path in image_paths:
-            if image_path:
-                # Calculate the position where the image would end
-                image_end_y = pdf_temp.get_y() + image_height
-
-                # Check if adding the image would go beyond the page's bottom margin
-                if image_end_y > page_height:
-                    pdf_temp.add_page()  # Start a new page if it doesn't fit
-
-                try:
-                    pdf_temp.image(image_path, x=10, y=pdf_temp.get_y(), w=image_width, h=image_height)
-                except RuntimeError as e:
-                    print(f"Error adding image to PDF: {e}")
-                    pdf_temp.add_page()  # Add a new page if an error occurs
-
-                pdf_temp.ln(image_height + 10)  # Move cursor to the next line after the image
-
-        pdf_temp.ln(10)  # Add space after each entry
-
-    # Save the temporary PDF
-    pdf_temp.output(pdf_path)
-
-    print(f"Detection log updated at: {pdf_path}")  # Print the log location
-    return pdf_path
-
-def detect_phone_and_humans():
-    global cap, detection_entries, last_saved_second, stop_flag
-
-    while not stop_flag.is_set():
-        with cap_lock:  # Ensure thread-safe access to cap
-            if cap is None or not cap.isOpened():
-                time.sleep(1)
-                continue
-
-            ret, frame = cap.read()
-
-        if not ret:
-            break
-
-        # Create a blurred version of the frame for background blur
-        blurred_frame = cv2.GaussianBlur(frame, (71, 71), 0)
-
-        person_counter = 0  # Reset person counter for each frame
-        detected_phone = False
-        image_paths = []
-        human_count = 0
-
-        results = model(frame)
-
-        for result in results:
-            boxes = result.boxes.xyxy.cpu().numpy()
-            confs = result.boxes.conf.cpu().numpy()
-            classes = result.boxes.cls.cpu().numpy()
-            names = result.names
-
-            for i, (box, conf, cls) in enumerate(zip(boxes, confs, classes)):
-                x1, y1, x2, y2 = map(int, box)
-                label = names[int(cls)]
-
-                if label == 'cell phone' and conf > 0.5:
-                    detected_phone = True
-                    color = (0, 255, 0)  # Green for cell phones
-                    # Overlay detected phone on the blurred background
-                    blurred_frame[y1:y2, x1:x2] = frame[y1:y2, x1:x2]
-                    cv2.rectangle(blurred_frame, (x1, y1), (x2, y2), color, 2)
-                    cv2.putText(blurred_frame, f'{label} {conf:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-                elif label == 'person':
-                    human_count += 1
-                    person_counter += 1  # Increment person counter
-                    person_label = f'Person {person_counter}'
-                    color = (255, 0, 0)  # Blue for humans
-                    # Overlay detected person on the blurred background
-                    blurred_frame[y1:y2, x1:x2] = frame[y1:y2, x1:x2]
-                    cv2.rectangle(blurred_frame, (x1, y1), (x2, y2), color, 2)
-                    cv2.putText(blurred_frame, f'{person_label} {conf:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-        # Capture screenshots of both the detection and the entire screen if phone or multiple people are detected
-        if detected_phone or human_count > 1:
-            # Save the blurred frame with bounding boxes
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            blurred_frame_path = os.path.join(snapshot_dir, f"blurred_frame_{timestamp}.png")
-            os.makedirs(snapshot_dir, exist_ok=True)
-            cv2.imwrite(blurred_frame_path, blurred_frame)
-
-            # Capture a screenshot of the entire screen
-            screenshot_path = os.path.join(snapshot_dir, f"screenshot_{timestamp}.png")
-            pyautogui.screenshot(screenshot_path)
-
-            detection_entries.append((f"Phone or multiple humans detected at: {timestamp}", [blurred_frame_path, screenshot_path]))
-            last_saved_second = timestamp
+evidence_format = "png"  # png, jpeg or webp (the PDF report can only embed png and jpeg)
+evidence_quality = 90  # JPEG/WebP quality
+incident_min_duration = 1.0  # Seconds a detection must persist before it becomes an incident
+incident_cooldown = 3.0  # Seconds without the detection before an incident closes
+evidence_clips = True  # Record one short clip per incident instead of still frames
+clip_pre_seconds = 3.0  # Seconds of video kept from before an incident starts
+clip_post_seconds = 3.0  # Seconds recorded after it starts
+keep_camera_open = True  # Keep the webcam open between sessions so detection starts at once (the camera light stays on)
+startup = StartupTimeline()  # Startup milestones and time to first detection
+screen_backend = "pyautogui"  # pyautogui, or fake to run without a desktop
+screen_interval = 2.0  # At most one screen grab per this many seconds
+# Frame buffers are recycled through capture, blur and evidence writing instead of reallocated per frame
+frame_pool = FramePool()
+# Snapshots and screenshots are encoded and written on background threads
+evidence_writer = EvidenceWriter(workers=2, max_pending=16, image_format=evidence_format, quality=evidence_quality, frame_pool=frame_pool)
+# Downscaled recent frames, encoded into a clip around each incident on a background thread
+clip_recorder = ClipRecorder(pre_seconds=clip_pre_seconds, post_seconds=clip_post_seconds)
+# Grabs the screen in the background; a new screenshot is stored only when the screen has changed
+screen_capture = ScreenCapture(make_screen_backend(screen_backend), evidence_writer, interval=screen_interval)
+
+# Annotated preview for headless runs, encoded only while someone is watching
+# A spawned inference worker re-imports this script as __mp_main__; it only needs the
+# definitions, so the servers, the camera and the model are never started there
+in_worker = __name__ == "__mp_main__"
+
+preview_server = None
+if preview_port and not in_worker:
+    preview_server = PreviewServer(preview_port, max_fps=preview_fps)
+    preview_server.start()
+
+# Local metrics endpoint and JSON snapshots; the metrics themselves are always recorded
+if metrics_port and not in_worker:
+    MetricsServer(metrics_port).start()
+metrics_dumper = None
+if metrics_dump_path and not in_worker:
+    metrics_dumper = MetricsDumper(metrics_dump_path, metrics_dump_interval)
+    metrics_dumper.start()
+
+# Every closed incident is committed here before it reaches the report
+event_store = EventStore(event_db_path)
+
+def load_detector():
+    model = load_backend(inference_backend, 'yolov8m.pt', int8=use_int8)  # Choose the appropriate model size
+    detector = make_detector(model, two_stage_phones, person_imgsz, phone_crop_imgsz)
+    if cascade_models:
+        fast_model = load_backend(inference_backend, fast_weights, int8=use_int8)
+        detector = CascadeDetector(make_detector(fast_model, two_stage_phones, person_imgsz, phone_crop_imgsz), detector,
+                                   band=escalation_band)
+    return detector
+
+if in_worker:
+    detector = None
+elif inference_workers:
+    # Frames go to worker processes through shared memory; the detection thread only waits for results
+    detector = InferencePool({"weights": 'yolov8m.pt', "backend": inference_backend, "int8": use_int8,
+                              "two_stage": two_stage_phones, "person_imgsz": person_imgsz, "phone_imgsz": phone_crop_imgsz,
+                              "fast_weights": fast_weights if cascade_models else None, "band": escalation_band},
+                             workers=inference_workers, torch_threads=max(1, (os.cpu_count() or 1) // inference_workers))
+else:
+    # The model loads and warms up in the background while the watcher and camera start
+    detector = LazyDetector(load_detector, timeline=startup)
+# The webcam is opened ahead of the first session instead of when the window becomes active
+camera = CameraPrimer(lambda: cv2.VideoCapture(0), keep_open=keep_camera_open, timeline=startup)
+if not in_worker:
+    camera.prime()
+
+def evidence_name(incident):
+    return f"{incident.start_time.strftime('%Y-%m-%d_%H-%M-%S')}_{incident.incident_id}"
+
+def save_incident_frame(incident, frame, role):
+    name = evidence_name(incident)
+    image_paths = []
+    if evidence_clips:
+        # One clip around the start of the incident replaces the still frames; the encoder adds
+        # its path to the incident once the file is on disk
+        if role == "start":
+            clip_recorder.start_clip(snapshot_dir, f"clip_{name}", on_written=incident.frame_paths.append)
+    else:
+        image_paths = [evidence_writer.submit_frame(snapshot_dir, f"{role}_{name}", frame)]
+    if role == "start":
+        # Screenshot when the incident opens, or the previous one if the screen hasn't changed
+        image_paths.append(screen_capture.capture(snapshot_dir, f"screen_{name}"))
+    return [path for path in image_paths if path]  # Skip anything dropped under load
+
+# Collapses per-frame detections into incidents with a few representative frames each
+incident_engine = IncidentEngine(save_incident_frame, min_duration=incident_min_duration, cooldown=incident_cooldown,
+                                 frame_pool=frame_pool)
+
+def record_closed(report, session, incident):
+    if evidence_clips:
+        # Settle the incident's clip first, so the event links it only if it was written
+        clip_recorder.wait(clip_recorder.path_for(snapshot_dir, f"clip_{evidence_name(incident)}"))
+    report.add(event_store.record_incident(session, incident))
+
+def flush_evidence():
+    # Wait for queued images and clips before the report embeds them
+    evidence_writer.flush()
+    clip_recorder.flush()
+
+def start_report():
+    global report_writer, session_id
+    session_id = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    # Entries are rendered into segments while the session runs and merged into pdf_path at the end
+    report_writer = StreamingReportWriter(pdf_path, before_render=flush_evidence)
+    screen_capture.start()  # Screen grabs only run during a session
+
+def finish_report():
+    global report_writer
+    if report_writer is None:
+        return
+    for incident in incident_engine.close_all():  # Incidents still open when the session stops
+        record_closed(report_writer, session_id, incident)
+    clip_recorder.finish_recording()  # Clips still waiting for post-event frames
+    screen_capture.stop()
+    report_writer.finalize()
+    print(f"Report stats: {report_writer.stats()}")  # Entries, segments and checkpoints written
+    report_writer = None
+
+def read_frame(session_cap, buffer=None):
+    with cap_lock:  # Ensure thread-safe access to cap
+        if not session_cap.isOpened():
+            return None
+        return session_cap.read(buffer)  # Decode straight into the pooled buffer
+
+def detect_phone_and_humans(session_cap, session_stop):
+    # Runs one webcam session; session_stop belongs to this session only, so a thread that
+    # is slow to notice its stop can never be revived by the next session's start
+    global cap
+    report, session = report_writer, session_id  # This session's report, even after the watcher moves on
+
+    # Capture runs on its own thread so inference stalls never back up the camera
+    frame_buffer = FrameRingBuffer(capacity=frame_buffer_size, release=frame_pool.release)
+    capture_thread = CaptureThread(lambda buffer=None: read_frame(session_cap, buffer), frame_buffer, session_stop,
+                                   frame_pool=frame_pool)
+    capture_thread.start()
+
+    # Skip the model on static frames and reuse the last detections
+    motion_gate = MotionGate(threshold=motion_threshold, force_every=motion_force_every)
+    person_tracker = PersonTracker(detect_every=detect_every)  # Keeps person IDs stable across frames
+    frame_analyzer = FrameAnalyzer(motion_gate, person_tracker)  # The same per-frame step as the batch and server pipelines
+    background_blur = BackgroundBlur(quality=blur_quality)  # Reuses its buffers and the last blur on static frames
+
+    def apply_quality(settings):
+        person_tracker.detect_every = settings["detect_every"]  # Inference frame rate
+        person_tracker.confidence_decay = settings["confidence_decay"]  # Tracks last as long as the detect gap
+        if settings["imgsz"]:
+            set_input_size(detector, settings["imgsz"])
+        if settings["blur_quality"]:
+            background_blur.set_quality(settings["blur_quality"])
+
+    # Trades detection quality for latency under load, and restores it when there is headroom again
+    latency_controller = None
+    if latency_budget:
+        imgsz = (person_imgsz if two_stage_phones else 640) if inference_backend == "pytorch" and not inference_workers else None  # Exports and workers keep their size
+        levels = degradation_ladder(imgsz, detect_every, blur_quality, confidence_decay=person_tracker.confidence_decay)
+        latency_controller = LatencyController(latency_budget, levels, apply_quality, log_path=latency_log_path)
+
+    while not session_stop.is_set():
+        frame = frame_buffer.get_latest(timeout=1)  # Always work on the newest frame
+        if frame is None:
+            if capture_thread.finished.is_set():
+                break  # The camera stopped delivering frames
+            continue
+        frame_started = time.perf_counter()
+
+        step = frame_analyzer.gate(frame)  # None on a static frame, "track" between detector runs
+        detections = inference_seconds = None
+        if step == "detect":
+            inference_start = time.perf_counter()
+            try:
+                detections = detector(frame)  # Compact array of person and phone detections
+            except RuntimeError:
+                if not detector_failed():
+                    raise
+                frame_pool.release(frame)
+                break  # Ends the session; the watcher stops too
+            inference_seconds = time.perf_counter() - inference_start
+            startup.detection_done()
+        # Phones come straight from the detections, persons from the tracker so their IDs stay stable
+        phones, confirmed_tracks, signals, boxes = frame_analyzer.apply(frame, step, detections, inference_seconds)
+        moved = step is not None
+
+        # Blurred copy of the frame; detected objects are pasted back in sharp below
+        blurred_frame = background_blur.background(frame, static=not moved, out=frame_pool.acquire(frame.shape, stage="blur"))
+
+        detected_phone = len(phones) > 0
+        # Boxes are only drawn when someone will see them: the window, a preview viewer or incident evidence
+        preview_due = preview_server is not None and preview_server.wants_frame()
+        annotate = not headless or preview_due or detected_phone or len(confirmed_tracks) > 1
+        for x1, y1, x2, y2, conf, _ in phones.tolist():
+            color = (0, 255, 0)  # Green for cell phones
+            # Overlay detected phone on the blurred background
+            blurred_frame[y1:y2, x1:x2] = frame[y1:y2, x1:x2]
+            if annotate:
+                cv2.rectangle(blurred_frame, (x1, y1), (x2, y2), color, 2)
+                cv2.putText(blurred_frame, f'cell phone {conf:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        # Persons come from the tracker so their IDs stay stable across frames
+        frame_height, frame_width = frame.shape[:2]
+        for track in person_tracker.visible_tracks():
+            x1, y1, x2, y2 = track.clipped_box(frame_width, frame_height)
+            person_label = f'Person {track.track_id}'
+            color = (255, 0, 0)  # Blue for humans
+            # Overlay detected person on the blurred background
+            blurred_frame[y1:y2, x1:x2] = frame[y1:y2, x1:x2]
+            if annotate:
+                cv2.rectangle(blurred_frame, (x1, y1), (x2, y2), color, 2)
+                cv2.putText(blurred_frame, f'{person_label} {track.confidence:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        # Collapse per-frame detections into incidents; only closed incidents become report entries
+        if evidence_clips:
+            clip_recorder.add_frame(blurred_frame, time.monotonic())
+        for incident in incident_engine.update(datetime.datetime.now(), signals, blurred_frame, boxes):
+            record_closed(report, session, incident)
 
         # Show the frame with blurred background and sharp detected objects
-        cv2.imshow("Phone and Human Detection", blurred_frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            stop_flag.set()
-
-    with cap_lock:  # Release the webcam safely
-        if cap is not None:
-            cap.release()
-    cv2.destroyAllWindows()
+        if preview_due:
+            preview_server.publish(blurred_frame)
+        if not headless:
+            cv2.imshow("Phone and Human Detection", blurred_frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                session_stop.set()
+        frames_processed.inc()
+        frame_seconds.observe(time.perf_counter() - frame_started)
+        # Frames captured before the model was loaded and warmed up carry its startup stall
+        if latency_controller is not None and detector.ready_at is not None and frame_buffer.last_captured_at >= detector.ready_at:
+            latency_controller.observe(time.monotonic() - frame_buffer.last_captured_at)
+        frame_pool.release(frame)  # Back to the pool unless the incident engine or evidence writer still holds it
+        frame_pool.release(blurred_frame)
+
+    capture_thread.join(timeout=2)
+    frame_buffer.clear()  # Frames captured but never processed go back to the pool
+    clip_recorder.clear()  # The next session's clips start from its own frames
+    print(f"Capture stats: {frame_buffer.stats()}")  # Captured, dropped and stale frame counts
+    print(f"Motion gate stats: {motion_gate.stats()}")  # How often the model was skipped
+    print(f"Tracker stats: {person_tracker.stats()}")  # How often the detector actually ran
+    if latency_controller is not None:
+        print(f"Latency controller stats: {latency_controller.stats()}")  # Quality level and steps taken
+    if two_stage_phones or cascade_models:
+        print(f"Detector stats: {detector.stats()}")  # Escalation rate, crops and per-stage latency
+    print(f"Blur stats: {background_blur.stats()}")  # Blurs computed and reused
+    print(f"Evidence writer stats: {evidence_writer.stats()}")  # Written, dropped and pending images
+    print(f"Clip recorder stats: {clip_recorder.stats()}")  # Clips started, written and dropped
+    print(f"Screen capture stats: {screen_capture.stats()}")  # Grabs, stored and reused screenshots
+    print(f"Frame pool stats: {frame_pool.stats()}")  # Allocations per stage stop growing once the pool is warm
+
+    with cap_lock:  # A session that ended on its own ('q' or a camera failure) releases its webcam
+        if cap is session_cap:
+            cap = None
+            session_cap.release()
+    if not headless:
+        cv2.destroyAllWindows()
+
+def detector_failed():
+    # A model that failed to load never recovers; end the watcher instead of reopening the camera every cycle
+    if detector.error is None:
+        return False
+    print(f"Error: the detector could not be loaded ({detector.error}). Stopping.")
+    if watcher is not None:
+        watcher.request_stop()
+    return True
+
+def start_session():
+    global cap, stop_flag, detection_thread
+    if detector_failed():
+        return
+    with cap_lock:  # Ensure thread-safe access to cap
+        if cap is not None and cap.isOpened():
+            return
+        print("Target window detected and active! Starting the webcam...")
+        cap = camera.take()
+        if cap is None:
+            print("Error: Failed to open webcam.")
+            return
+        stop_flag = threading.Event()  # Fresh stop event for this session
+        session_cap, session_stop = cap, stop_flag
+        startup.session_started()
+    if detection_thread is not None:
+        detection_thread.join()  # The previous session may have ended on its own, without a stop
+    finish_report()  # Finalizes its report in that case
+    start_report()
+    detection_thread = threading.Thread(target=detect_phone_and_humans, args=(session_cap, session_stop))
+    detection_thread.start()
+
+def stop_session(reason):
+    global cap, manual_stop
+    with cap_lock:  # Ensure thread-safe access to cap
+        if cap is None or not cap.isOpened():
+            return
+        print(f"{stop_messages[reason]} Stopping the webcam...")
+        session_cap, cap = cap, None
+        stop_flag.set()  # Stop the detection thread
+        manual_stop = False  # Reset manual stop flag
+    if detection_thread is not None:
+        detection_thread.join()  # Wait until it is done with the webcam and the report
+    camera.give_back(session_cap)  # Stays open for the next session if keep_camera_open
+    finish_report()  # Outside cap_lock so rendering never blocks the camera
+
+stop_messages = {"inactive": "Target window is minimized or not active.", "closed": "Target window closed."}
 
 def detect_target_window():
-    global cap, stop_flag, detection_entries, manual_stop
-    while True:
-        windows = gw.getWindowsWithTitle(target_title_substr)
-        if windows:
-            target_window = windows[0]
-            if target_window.isMinimized or not target_window.isActive:
-                with cap_lock:  # Ensure thread-safe access to cap
-                    if cap is not None and cap.isOpened():
-                        print("Target window is minimized or not active. Stopping the webcam...")
-                        cap.release()
-                        cap = None
-                        stop_flag.set()  # Stop the detection thread
-                        create_pdf(detection_entries, pdf_path)  # Generate the PDF when the webcam stops
-                        detection_entries = []  # Clear the entries after saving to PDF
-                        manual_stop = False  # Reset manual stop flag
-            else:
-                with cap_lock:  # Ensure thread-safe access to cap
-                    if cap is None or not cap.isOpened():
-                        print("Target window detected and active! Starting the webcam...")
-                        cap = cv2.VideoCapture(0)
-                        if cap.isOpened():
-                            stop_flag.clear()  # Clear the stop flag before starting
-                            threading.Thread(target=detect_phone_and_humans).start()
-                        else:
-                            print("Error: Failed to open webcam.")
-        else:
-            with cap_lock:  # Ensure thread-safe access to cap
-                if cap is not None and cap.isOpened():
-                    print("Target window closed. Stopping the webcam...")
-                    cap.release()
-                    cap = None
-                    stop_flag.set()  # Stop the detection thread
-                    create_pdf(detection_entries, pdf_path)  # Generate the PDF when the webcam stops
-                    detection_entries = []  # Clear the entries after saving to PDF
-                    manual_stop = False  # Reset manual stop flag
-
-        time.sleep(2)
+    # Starting and stopping run on the watcher's dispatcher thread, never on the polling loop
+    global watcher
+    watcher = WindowWatcher(make_window_backend(window_backend), target_title_substr, start_session, stop_session,
+                            poll_interval=window_poll_interval, debounce=window_debounce)
+    try:
+        watcher.run()
+    finally:
+        watcher.stop()  # Let a running start or stop finish before the caller cleans up
+        print(f"Window watcher: {watcher.stats()}")
+        print(f"Startup: {startup.stats()}, camera {camera.stats()}")
+        camera.close()
+        if inference_workers:
+            print(f"Inference workers: {detector.stats()}")
+            detector.close()
+        if metrics_dumper is not None:
+            metrics_dumper.stop()  # Final snapshot
 
 if __name__ == "__main__":
     print("Starting Detection")
@@ -206,4 +399,4 @@ if __name__ == "__main__":
                 cap.release()
         stop_flag.set()
         if not manual_stop:  # Create PDF only if not manually stopped
-            create_pdf(detection_entries, pdf_path)  # Create the final PDF
+            finish_report()  # Finalize the report of the last session
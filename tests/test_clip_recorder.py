@@ -0,0 +1,38 @@
+import os
+import numpy as np
+import clip_recorder
+from clip_recorder import ClipRecorder, thumbnail_path
+
+
+def record(recorder, directory, written):
+    for i in range(5):
+        recorder.add_frame(np.full((120, 160, 3), i * 40, dtype=np.uint8), i * 0.1)
+    path = recorder.start_clip(str(directory), "start_1", on_written=written.append)
+    recorder.wait(path, timeout=10)  # Still collecting post-event frames, so it is encoded now
+    return path
+
+
+def test_clip_is_linked_once_written(tmp_path):
+    recorder = ClipRecorder(fps=10, scale_width=80)
+    written = []
+    path = record(recorder, tmp_path, written)
+    assert written == [path]
+    assert os.path.getsize(path) > 0 and os.path.exists(thumbnail_path(path))
+    assert recorder.stats()["clips_written"] == 1 and recorder.stats()["recording"] == 0
+
+
+def test_clip_without_an_encoder_is_not_linked(tmp_path, monkeypatch):
+    class ClosedWriter:
+        def __init__(self, *args):
+            pass
+
+        def isOpened(self):
+            return False
+
+    monkeypatch.setattr(clip_recorder.cv2, "VideoWriter", ClosedWriter)
+    recorder = ClipRecorder(fps=10, scale_width=80)
+    written = []
+    path = record(recorder, tmp_path, written)
+    assert written == [] and not os.path.exists(path)
+    assert recorder.stats()["clips_failed"] == 1 and recorder.stats()["clips_written"] == 0
+    recorder.wait(path)  # Settled clips return at once
@@ -0,0 +1,48 @@
+import datetime
+import pytest
+from event_store import EventStore
+
+start = datetime.datetime(2024, 1, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"))
+    # Recorded out of time order, queries still return them sorted by start time
+    for minute, session, event_type in [(30, "b", "Phone detected"), (0, "a", "Phone detected"),
+                                        (10, "a", "Multiple humans detected"), (20, "a", "Phone detected"),
+                                        (40, "b", "Window left")]:
+        begin = start + datetime.timedelta(minutes=minute)
+        store.record(session, event_type, begin, begin + datetime.timedelta(seconds=5), 0.8,
+                     boxes=[(1.6, 2, 3, 4)], evidence_paths=[f"{minute}.png"])
+    yield store
+    store.close()
+
+
+def minutes(events):
+    return [int((event.start_time - start).total_seconds() // 60) for event in events]
+
+
+def test_query_without_filters_returns_everything_in_time_order(store):
+    events = store.query()
+    assert minutes(events) == [0, 10, 20, 30, 40]
+    assert events[0].boxes == [[1, 2, 3, 4]] and events[0].evidence_paths == ["0.png"]
+
+
+def test_query_filters_combine(store):
+    assert minutes(store.query(session="a")) == [0, 10, 20]
+    assert minutes(store.query(event_types=["Phone detected"])) == [0, 20, 30]
+    assert minutes(store.query(event_types=["Phone detected", "Window left"])) == [0, 20, 30, 40]
+    assert minutes(store.query(session="a", event_types=["Phone detected"])) == [0, 20]
+
+
+def test_time_window_includes_since_and_excludes_until(store):
+    since, until = start + datetime.timedelta(minutes=10), start + datetime.timedelta(minutes=30)
+    assert minutes(store.query(since=since, until=until)) == [10, 20]
+    assert minutes(store.query(since=since, until=until, session="b")) == []
+    assert minutes(store.query(since=since, limit=2)) == [10, 20]
+
+
+def test_counts_per_type(store):
+    assert store.counts() == {"Phone detected": 3, "Multiple humans detected": 1, "Window left": 1}
+    assert store.counts(session="b") == {"Phone detected": 1, "Window left": 1}
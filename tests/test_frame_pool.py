@@ -0,0 +1,50 @@
+import datetime
+import numpy as np
+from frame_buffer import FrameRingBuffer
+from frame_pool import FramePool
+from incidents import IncidentEngine
+
+shape = (4, 4, 3)
+
+
+def test_buffer_returns_to_pool_after_last_release():
+    pool = FramePool()
+    frame = pool.acquire(shape)
+    pool.retain(frame)  # A second holder, e.g. the incident engine
+    pool.release(frame)
+    assert pool.stats()["outstanding"] == 1
+    pool.release(frame)
+    assert pool.stats()["outstanding"] == 0 and pool.stats()["idle"] == 1
+    pool.release(frame)  # Releasing again is ignored rather than corrupting the counts
+    pool.retain(np.zeros(shape, dtype=np.uint8))  # So are arrays from elsewhere
+    assert pool.acquire(shape) is frame
+    assert pool.stats()["allocated"] == {"frame": 1} and pool.stats()["reused"] == {"frame": 1}
+
+
+def test_frames_dropped_by_the_ring_buffer_go_back_to_the_pool():
+    pool = FramePool()
+    buffer = FrameRingBuffer(capacity=2, release=pool.release)
+    frames = [pool.acquire(shape, stage="capture") for _ in range(5)]
+    for frame in frames:
+        buffer.put(frame)  # The three oldest are pushed out of the ring
+    assert pool.stats()["outstanding"] == 2
+    latest = buffer.get_latest(timeout=0)  # Skips the older buffered frame
+    assert latest is frames[-1] and pool.stats()["outstanding"] == 1
+    pool.release(latest)
+    buffer.put(pool.acquire(shape, stage="capture"))
+    buffer.clear()  # Session end: frames captured but never processed
+    assert pool.stats()["outstanding"] == 0
+    assert buffer.stats()["dropped"] == 4
+
+
+def test_frames_held_by_open_incidents_are_released_at_session_end():
+    pool = FramePool()
+    engine = IncidentEngine(lambda incident, frame, role: [], min_duration=0.0, frame_pool=pool)
+    start = datetime.datetime(2024, 1, 1)
+    for i, confidence in enumerate([0.5, 0.9, 0.6]):
+        frame = pool.acquire(shape)
+        engine.update(start + datetime.timedelta(seconds=i), {"Phone detected": confidence}, frame)
+        pool.release(frame)  # The loop is done with it; the engine keeps the peak and last frames
+    assert pool.stats()["outstanding"] == 2
+    engine.close_all()
+    assert pool.stats()["outstanding"] == 0
@@ -0,0 +1,79 @@
+import datetime
+import numpy as np
+from incidents import IncidentEngine
+
+start = datetime.datetime(2024, 1, 1, 12, 0, 0)
+phone = "Phone detected"
+
+
+def at(seconds):
+    return start + datetime.timedelta(seconds=seconds)
+
+
+def frame():
+    return np.zeros((4, 4, 3), dtype=np.uint8)
+
+
+def recording_engine(**options):
+    # An engine whose saved frames are recorded as (incident id, role) instead of written
+    saved = []
+    engine = IncidentEngine(lambda incident, frame, role: saved.append((incident.incident_id, role)) or [role], **options)
+    return engine, saved
+
+
+def run(engine, confidences, step=0.5):
+    # Feeds one phone signal per `step` seconds; None is a frame without a phone
+    closed = []
+    for i, confidence in enumerate(confidences):
+        closed += engine.update(at(i * step), {phone: confidence}, frame())
+    return closed
+
+
+def test_signal_shorter_than_min_duration_never_opens():
+    engine, saved = recording_engine(min_duration=1.0, cooldown=1.0)
+    closed = run(engine, [0.9, 0.9] + [None] * 6)  # Seen for 0.5 s
+    assert closed == [] and not engine.active and not engine.pending
+    assert engine.stats()["incidents_opened"] == 0 and saved == []
+
+
+def test_incident_opens_after_min_duration_from_first_sighting():
+    engine, saved = recording_engine(min_duration=1.0, cooldown=1.0)
+    run(engine, [0.6, 0.8, 0.7])  # 0 s, 0.5 s, 1.0 s
+    incident = engine.active[phone]
+    assert incident.start_time == at(0) and incident.peak_confidence == 0.8
+    assert saved == [(1, "start")]
+
+
+def test_zero_min_duration_opens_on_first_sighting():
+    engine, saved = recording_engine(min_duration=0.0)
+    run(engine, [0.9])
+    assert engine.active[phone].start_time == at(0) and saved == [(1, "start")]
+
+
+def test_gap_within_cooldown_keeps_one_incident():
+    engine, _ = recording_engine(min_duration=1.0, cooldown=3.0)
+    closed = run(engine, [0.9] * 4 + [None] * 4 + [0.9] * 4)  # 2 s gap
+    assert closed == [] and engine.stats()["incidents_opened"] == 1
+    assert engine.active[phone].last_seen == at(11 * 0.5)
+
+
+def test_absence_longer_than_cooldown_closes_at_last_sighting():
+    engine, saved = recording_engine(min_duration=1.0, cooldown=1.0)
+    closed = run(engine, [0.7, 0.8, 0.8, 0.9, 0.7] + [None] * 4)  # Opens at 1 s, peaks at 1.5 s
+    assert len(closed) == 1 and not engine.active
+    incident = closed[0]
+    assert incident.end_time == at(2.0)  # The last frame with the signal, not when the cooldown ran out
+    assert incident.peak_confidence == 0.9
+    assert [role for _, role in saved] == ["start", "peak", "end"]
+    assert incident.frame_paths == ["start", "peak", "end"]
+
+
+def test_close_all_closes_open_incidents_and_drops_pending_ones():
+    engine, _ = recording_engine(min_duration=1.0, cooldown=5.0)
+    run(engine, [0.9] * 4)
+    engine.update(at(2.0), {phone: 0.9, "Multiple humans detected": 0.8}, frame())  # Second type only pending
+    closed = engine.close_all()
+    assert [incident.event_type for incident in closed] == [phone]
+    assert closed[0].end_time == at(2.0)
+    assert not engine.active and not engine.pending
+    assert engine.close_all() == []
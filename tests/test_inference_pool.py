@@ -0,0 +1,71 @@
+import os
+import time
+import numpy as np
+import pytest
+from detection import empty_detections
+from inference_pool import InferencePool
+
+
+class ExitOnWhiteFrame:
+    # Stands in for a model: a white frame kills the worker process while it holds the frame
+    def __call__(self, frame, **kwargs):
+        if frame[0, 0, 0] == 255:
+            os._exit(3)
+        time.sleep(0.01)
+        return empty_detections()
+
+
+def build_fake(**options):
+    return ExitOnWhiteFrame()
+
+
+def build_broken(**options):
+    raise RuntimeError("no weights")
+
+
+def frame(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def test_worker_dying_mid_frame_fails_its_frames_only():
+    pool = InferencePool({}, workers=2, build=build_fake, check_interval=0.1)
+    try:
+        pool.wait_ready(timeout=60)
+        assert pool.ready_at is not None
+        sequences = [pool.submit(frame(255))] + [pool.submit(frame(0)) for _ in range(3)]
+        start = time.monotonic()
+        outcomes = []
+        for sequence in sequences:
+            try:
+                outcomes.append(len(pool.result(sequence, timeout=10)))
+            except RuntimeError:
+                outcomes.append("failed")
+        assert time.monotonic() - start < 5  # Nothing waits for the result timeout
+        assert outcomes[0] == "failed"
+        assert pool.stats()["exited_workers"] == 1
+        assert len(pool(frame(0))) == 0  # The other worker keeps serving
+    finally:
+        pool.close()
+
+
+def test_last_worker_gone_raises():
+    pool = InferencePool({}, workers=1, build=build_fake, check_interval=0.1)
+    try:
+        pool.wait_ready(timeout=60)
+        sequence = pool.submit(frame(255))
+        with pytest.raises(RuntimeError, match="exited"):
+            pool.result(sequence, timeout=10)
+        time.sleep(0.3)
+        with pytest.raises(RuntimeError, match="No inference worker left"):
+            pool.submit(frame(0))
+    finally:
+        pool.close()
+
+
+def test_failed_load_is_reported():
+    pool = InferencePool({}, workers=1, build=build_broken, check_interval=0.1)
+    try:
+        with pytest.raises(RuntimeError, match="no weights"):
+            pool.wait_ready(timeout=60)
+    finally:
+        pool.close()
@@ -0,0 +1,96 @@
+import asyncio
+from ingest_server import IngestServer, http_request, synthetic_jpegs
+from detection import empty_detections
+
+
+def serve(tmp_path, infer_batch, test, **options):
+    # Runs `test(server, port)` against a server on a free local port, then stops the server
+    async def main():
+        server = IngestServer(infer_batch, str(tmp_path), **options)
+        listener = await server.start("127.0.0.1", 0)
+        try:
+            return await asyncio.wait_for(test(server, listener.sockets[0].getsockname()[1]), 10)
+        finally:
+            await asyncio.wait_for(server.stop(), 5)
+    return asyncio.run(main())
+
+
+def no_detections(frames):
+    return [empty_detections() for _ in frames]
+
+
+def test_inference_error_is_a_500(tmp_path, capsys):
+    def failing(frames):
+        raise RuntimeError("model exploded")
+
+    async def test(server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        first = await http_request(reader, writer, "POST", "/sessions/a/frames", synthetic_jpegs(1)[0])
+        second = await http_request(reader, writer, "GET", "/stats")
+        writer.close()
+        return first, second
+
+    (status, payload), (second_status, _) = serve(tmp_path, failing, test)
+    assert status == 500 and "model exploded" in payload["error"]
+    assert second_status == 200  # The connection stays usable
+    assert "never retrieved" not in capsys.readouterr().err
+
+
+def test_bad_frame_time_is_a_400(tmp_path):
+    async def test(server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        bad = await http_request(reader, writer, "POST", "/sessions/a/frames", synthetic_jpegs(1)[0],
+                                 {"X-Frame-Time": "yesterday"})
+        good = await http_request(reader, writer, "POST", "/sessions/a/frames", synthetic_jpegs(1)[0],
+                                  {"X-Frame-Time": "1700000000.5"})
+        writer.close()
+        return bad[0], good[0]
+
+    assert serve(tmp_path, no_detections, test) == (400, 200)
+
+
+async def raw_request(port, data):
+    # Sends raw bytes and reads until the server closes the connection; returns the status code
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split()[1])
+
+
+def test_unframeable_requests_are_refused(tmp_path):
+    async def test(server, port):
+        statuses = []
+        for length in (b"-5", b"12abc", b"", b"1e3"):
+            statuses.append(await raw_request(port, b"POST /sessions/a/frames HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n"))
+        statuses.append(await raw_request(port, b"POST /sessions/a/frames\r\n\r\n"))
+        # Refused from the header alone: the body is never sent, so a read would hang
+        statuses.append(await raw_request(port, b"POST /sessions/a/frames HTTP/1.1\r\nContent-Length: 5000\r\n\r\n"))
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        good = await http_request(reader, writer, "POST", "/sessions/a/frames", synthetic_jpegs(1, (64, 48))[0])
+        writer.close()
+        return statuses, good[0]
+
+    statuses, good = serve(tmp_path, no_detections, test, max_frame_bytes=4000)
+    assert statuses == [400, 400, 400, 400, 400, 413]
+    assert good == 200
+
+
+def test_stop_closes_keep_alive_connections(tmp_path, capsys):
+    async def main():
+        server = IngestServer(no_detections, str(tmp_path))
+        port = (await server.start("127.0.0.1", 0)).sockets[0].getsockname()[1]
+        connections = [await asyncio.open_connection("127.0.0.1", port) for _ in range(3)]
+        for i, (reader, writer) in enumerate(connections):
+            await http_request(reader, writer, "POST", f"/sessions/s{i}/frames", synthetic_jpegs(1)[0])
+        await asyncio.wait_for(server.stop(), 5)
+        closed = [await reader.read() == b"" for reader, _ in connections]  # EOF from the server side
+        for _, writer in connections:
+            writer.close()
+        return server, closed
+
+    server, closed = asyncio.run(asyncio.wait_for(main(), 10))
+    assert closed == [True, True, True]
+    assert not server.connections and server.closed_sessions == 3
+    assert "CancelledError" not in capsys.readouterr().err
@@ -0,0 +1,22 @@
+from latency_controller import degradation_ladder
+from tracker import PersonTracker
+
+
+def model_calls(level, confidence, frames=400):
+    # Model calls for one person tracked at `confidence` over `frames` frames at a quality level
+    tracker = PersonTracker(detect_every=level["detect_every"], confidence_decay=level["confidence_decay"])
+    for _ in range(frames):
+        if tracker.needs_detection():
+            tracker.update([[100, 100, 200, 300]], [confidence])
+        else:
+            tracker.predict()
+    return tracker.detections_run
+
+
+def test_each_level_cuts_model_calls():
+    levels = degradation_ladder(640, 5, None)
+    assert levels[0]["confidence_decay"] == 0.9  # Full quality keeps the tracker's own setting
+    for confidence in (0.85, 0.5):
+        calls = [model_calls(level, confidence) for level in levels]
+        for better, worse in zip(calls, calls[1:]):
+            assert worse <= better * 0.65, (confidence, calls)  # About half, give or take a frame of rounding
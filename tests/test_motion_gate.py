@@ -0,0 +1,37 @@
+import numpy as np
+from detection import empty_detections
+from frame_analyzer import FrameAnalyzer
+from motion_gate import MotionGate
+from tracker import PersonTracker
+
+
+def frames(moving, static):
+    rng = np.random.default_rng(0)
+    for _ in range(moving):
+        yield rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    still = np.zeros((120, 160, 3), dtype=np.uint8)
+    for _ in range(static):
+        yield still
+
+
+def test_inferred_counts_model_runs_not_gate_passes():
+    analyzer = FrameAnalyzer(MotionGate(force_every=100), PersonTracker(detect_every=5))
+    calls = []
+    for frame in frames(20, 10):
+        analyzer.step(frame, lambda frame: calls.append(frame) or empty_detections())
+    stats = analyzer.motion_gate.stats()
+    assert stats["moved"] == 21 and stats["skipped"] == 9  # The first still frame still differs
+    assert stats["inferred"] == len(calls) < stats["moved"]  # The tracker covered the rest
+    # A failed model call leaves the last detections and is not a model run either
+    analyzer.apply(next(frames(1, 0)), "detect", None)
+    assert analyzer.motion_gate.stats()["inferred"] == len(calls)
+
+
+def test_time_saved_uses_the_average_of_timed_runs():
+    gate = MotionGate()
+    gate.skipped = 10
+    gate.record_inference(0.2)
+    gate.record_inference()  # Untimed runs, e.g. pooled inference, don't dilute the average
+    gate.record_inference(0.4)
+    assert gate.stats()["inferred"] == 3
+    assert gate.stats()["model_seconds_saved"] == 3.0
@@ -0,0 +1,58 @@
+import os
+import time
+from PyPDF2 import PdfReader
+from report import StreamingReportWriter
+
+
+class Entry:
+    def __init__(self, text):
+        self.text = text
+        self.evidence_paths = []
+
+    def describe(self):
+        return self.text
+
+    def is_alert(self):
+        return False
+
+
+def write_entries(writer, texts):
+    # Adds the entries and waits until the background thread has appended each to the report
+    for text in texts:
+        writer.add(Entry(text))
+    deadline = time.monotonic() + 10
+    while writer.entries_written < len(texts) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.entries_written == len(texts)
+
+
+def report_text(path):
+    return " ".join(page.extract_text() for page in PdfReader(path, strict=True).pages)
+
+
+def test_finalize_moves_the_running_report_into_place(tmp_path):
+    pdf_path = str(tmp_path / "log.pdf")
+    writer = StreamingReportWriter(pdf_path, entries_per_segment=1)
+    write_entries(writer, [f"entry {i}" for i in range(5)])
+    writer.add(Entry("entry 5"))  # Still pending when finalize() is called
+    writer.finalize(timeout=10)
+    text = report_text(pdf_path)
+    assert all(f"entry {i}" in text for i in range(6))
+    assert not os.path.exists(pdf_path + ".parts")
+
+
+def test_interrupted_sessions_recover_into_separate_reports(tmp_path):
+    pdf_path = str(tmp_path / "log.pdf")
+    crashed = StreamingReportWriter(pdf_path, entries_per_segment=1)
+    write_entries(crashed, ["first session a", "first session b"])
+    with open(crashed.report_path, "ab") as f:
+        f.write(b"\n99 0 obj\n<< /Half")  # An append cut short by the crash
+    crashed = StreamingReportWriter(pdf_path, entries_per_segment=1)  # Recovers the first session
+    write_entries(crashed, ["second session"])
+    StreamingReportWriter(pdf_path).finalize(timeout=10)  # Recovers the second session
+
+    recovered = sorted(str(path) for path in tmp_path.glob("log_recovered_*.pdf"))
+    assert len(recovered) == 2
+    texts = sorted(report_text(path) for path in recovered)
+    assert "first session a" in texts[0] and "first session b" in texts[0]
+    assert "second session" in texts[1] and "first session" not in texts[1]
@@ -0,0 +1,59 @@
+import cv2
+import numpy as np
+from screen_capture import FakeScreenBackend, ScreenCapture
+
+
+class RecordingWriter:
+    # Stands in for EvidenceWriter: remembers what would have been written
+    def __init__(self):
+        self.written = []
+
+    def submit_frame(self, directory, name, frame):
+        self.written.append(name)
+        return f"{directory}/{name}.png"
+
+
+class ChatScreenBackend:
+    # 1080p desktop with one window whose text can be swapped, optionally with a text cursor
+    def __init__(self, text="Question 3: Which of the following is a prime number?"):
+        self.text = text
+        self.cursor = False
+
+    def grab(self):
+        frame = np.full((1080, 1920, 3), 90, dtype=np.uint8)
+        cv2.rectangle(frame, (300, 200), (1400, 800), (235, 235, 235), -1)
+        cv2.putText(frame, self.text, (330, 400), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (30, 30, 30), 1)
+        if self.cursor:
+            cv2.line(frame, (330, 430), (330, 446), (30, 30, 30), 1)
+        return frame
+
+
+def capture_twice(backend, change):
+    writer = RecordingWriter()
+    capture = ScreenCapture(backend, writer)
+    capture.sample()
+    first = capture.capture("screens", "first")
+    change()
+    capture.sample()
+    second = capture.capture("screens", "second")
+    return first, second, writer
+
+
+def test_text_change_is_captured():
+    backend = ChatScreenBackend()
+    first, second, writer = capture_twice(backend, lambda: setattr(backend, "text", "WhatsApp: send me the answers to 3 and 4"))
+    assert writer.written == ["first", "second"]
+    assert first != second
+
+
+def test_moved_window_is_captured():
+    backend = FakeScreenBackend(change_every=1)  # The window moves on every grab
+    first, second, writer = capture_twice(backend, lambda: None)
+    assert writer.written == ["first", "second"]
+
+
+def test_unchanged_screen_reuses_the_stored_image():
+    backend = ChatScreenBackend()
+    first, second, writer = capture_twice(backend, lambda: setattr(backend, "cursor", True))  # A blinking cursor
+    assert writer.written == ["first"]
+    assert second == first
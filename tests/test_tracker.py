@@ -0,0 +1,45 @@
+import numpy as np
+from tracker import PersonTracker, iou_matrix
+
+
+def person(x, y=100):
+    return [x, y, x + 60, y + 160]
+
+
+def walk(tracker, frames, positions, seen=lambda index: True):
+    # Runs the tracker like the scripts do: the detector only on frames where it asks for it.
+    # `positions(index)` gives the true x of every person; returns the track ids per frame.
+    ids = []
+    for index in range(frames):
+        if tracker.needs_detection():
+            boxes = [person(x) for x in positions(index)] if seen(index) else []
+            tracker.update(boxes, [0.9] * len(boxes))
+        else:
+            tracker.predict()
+        ids.append(sorted(track.track_id for track in tracker.visible_tracks()))
+    return ids
+
+
+def test_ids_stay_stable_between_detections():
+    tracker = PersonTracker(detect_every=5)
+    ids = walk(tracker, 60, lambda index: (50 + 3 * index, 500 - 2 * index))
+    assert all(frame_ids == [1, 2] for frame_ids in ids)
+    assert tracker.detections_run < 60 // 3  # Most frames were propagated
+    # Propagated boxes follow the motion instead of lagging at the last detection
+    tracker.predict()
+    predicted = np.array([track.box for track in sorted(tracker.tracks, key=lambda track: track.track_id)])
+    truth = np.array([person(50 + 3 * 60), person(500 - 2 * 60)], dtype=np.float32)
+    assert np.diag(iou_matrix(predicted, truth)).min() > 0.7
+
+
+def test_id_survives_a_missed_detection_round():
+    tracker = PersonTracker(detect_every=3, max_misses=2)
+    ids = walk(tracker, 30, lambda index: (100 + 2 * index,), seen=lambda index: not 8 <= index < 12)
+    assert ids[8] == []  # The detection round on frame 8 found nobody
+    assert ids[-1] == [1] and tracker.stats()["tracks_created"] == 1
+
+
+def test_person_gone_longer_than_max_misses_gets_a_new_id():
+    tracker = PersonTracker(detect_every=3, max_misses=1)
+    walk(tracker, 30, lambda index: (100,), seen=lambda index: not 9 <= index < 18)
+    assert [track.track_id for track in tracker.visible_tracks()] == [2]
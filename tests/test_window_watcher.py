@@ -0,0 +1,90 @@
+import time
+from window_watcher import FakeWindowBackend, WindowWatcher
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def make_watcher(events, debounce=0.1):
+    backend = FakeWindowBackend()
+    backend.set_state("closed")
+    watcher = WindowWatcher(backend, "WhatsApp", lambda: events.append("start"),
+                            lambda reason: events.append(("stop", reason)), poll_interval=0.01, debounce=debounce)
+    return backend, watcher
+
+
+def test_start_after_debounce():
+    events = []
+    backend, watcher = make_watcher(events)
+    watcher.start()
+    try:
+        backend.set_state("active")
+        assert wait_until(lambda: events == ["start"])
+        assert watcher.stats()["starts"] == 1
+    finally:
+        watcher.stop()
+
+
+def test_flicker_is_ignored():
+    events = []
+    backend, watcher = make_watcher(events, debounce=0.3)
+    watcher.start()
+    try:
+        for _ in range(3):
+            backend.set_state("active")
+            time.sleep(0.05)
+            backend.set_state("closed")
+            time.sleep(0.05)
+        time.sleep(0.4)
+        assert events == []
+    finally:
+        watcher.stop()
+
+
+def test_close_stops_the_session_with_its_reason():
+    events = []
+    backend, watcher = make_watcher(events)
+    watcher.start()
+    try:
+        backend.set_state("active")
+        assert wait_until(lambda: events == ["start"])
+        backend.set_state("inactive")
+        time.sleep(0.03)
+        backend.set_state("closed")  # The newest reason wins within the debounce window
+        assert wait_until(lambda: len(events) == 2)
+        assert events[1] == ("stop", "closed")
+    finally:
+        watcher.stop()
+
+
+def test_slow_actions_do_not_delay_polling():
+    events = []
+    backend = FakeWindowBackend()
+    backend.set_state("closed")
+    watcher = WindowWatcher(backend, "WhatsApp", lambda: time.sleep(0.5), lambda reason: events.append(reason),
+                            poll_interval=0.01, debounce=0.05)
+    watcher.start()
+    try:
+        backend.set_state("active")
+        assert wait_until(lambda: watcher.stats()["starts"] == 1)
+        polls = watcher.stats()["polls"]
+        time.sleep(0.2)
+        assert watcher.stats()["polls"] > polls + 5  # Still polling while on_start sleeps
+    finally:
+        watcher.stop()
+    assert watcher.stats()["pending_actions"] == 0
+
+
+def test_fake_backend_follows_its_timeline():
+    backend = FakeWindowBackend(timeline=((0.2, "active"), (0.2, "inactive")))
+    assert backend.state("WhatsApp") == "active"
+    time.sleep(0.25)
+    assert backend.state("WhatsApp") == "inactive"
+    time.sleep(0.2)
+    assert backend.state("WhatsApp") == "active"  # The timeline repeats
@@ -0,0 +1,117 @@
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    # Pairwise intersection-over-union for two arrays of (x1, y1, x2, y2) boxes
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+class Track:
+    def __init__(self, track_id, box, confidence):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.detected_box = self.box.copy()  # Box at the last detection, used to estimate velocity
+        self.velocity = np.zeros(4, dtype=np.float32)  # Per-frame box motion
+        self.confidence = float(confidence)
+        self.hits = 1  # Detections matched to this track
+        self.misses = 0  # Consecutive detection rounds without a match
+
+    def clipped_box(self, width, height):
+        x1, y1, x2, y2 = self.box
+        return (int(np.clip(x1, 0, width - 1)), int(np.clip(y1, 0, height - 1)),
+                int(np.clip(x2, 0, width - 1)), int(np.clip(y2, 0, height - 1)))
+
+
+class PersonTracker:
+    # IoU tracker with constant-velocity propagation. The detector only has to run every
+    # `detect_every` frames, or sooner when the propagated tracks lose confidence.
+    def __init__(self, detect_every=5, iou_threshold=0.3, min_hits=2, max_misses=2,
+                 confidence_decay=0.9, min_confidence=0.35):
+        self.detect_every = detect_every
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits  # Matches needed before a track counts as a confirmed person
+        self.max_misses = max_misses  # Detection rounds a track survives without a match
+        self.confidence_decay = confidence_decay  # Confidence multiplier for every propagated frame
+        self.min_confidence = min_confidence  # Re-detect once any visible track decays below this
+        self.tracks = []
+        self.next_id = 1
+        self.frames_since_detection = 0
+        self.detections_run = 0
+        self.frames_propagated = 0
+
+    def needs_detection(self):
+        if self.detections_run == 0 or self.frames_since_detection >= self.detect_every:
+            return True
+        return any(track.confidence < self.min_confidence for track in self.visible_tracks())
+
+    def update(self, boxes, confs):
+        # Associate fresh detections with existing tracks, greedily by highest IoU
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        elapsed = max(1, self.frames_since_detection)
+        track_boxes = np.array([track.box for track in self.tracks], dtype=np.float32).reshape(-1, 4)
+        ious = iou_matrix(track_boxes, boxes)
+
+        matched_tracks, matched_boxes = set(), set()
+        for flat_index in np.argsort(ious, axis=None)[::-1]:
+            t, d = np.unravel_index(flat_index, ious.shape)
+            if ious[t, d] < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(d)
+
+            track = self.tracks[t]
+            motion = (boxes[d] - track.detected_box) / elapsed
+            track.velocity = 0.5 * track.velocity + 0.5 * motion  # Smooth out jittery detections
+            track.box = boxes[d].copy()
+            track.detected_box = boxes[d].copy()
+            track.confidence = float(confs[d])
+            track.hits += 1
+            track.misses = 0
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+                track.velocity[:] = 0
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        for d in range(len(boxes)):
+            if d not in matched_boxes:
+                self.tracks.append(Track(self.next_id, boxes[d], confs[d]))
+                self.next_id += 1
+
+        self.frames_since_detection = 0
+        self.detections_run += 1
+
+    def predict(self):
+        # Propagate visible tracks one frame without running the detector
+        for track in self.visible_tracks():
+            track.box = track.box + track.velocity
+            track.confidence *= self.confidence_decay
+        self.frames_since_detection += 1
+        self.frames_propagated += 1
+
+    def visible_tracks(self):
+        return [track for track in self.tracks if track.misses == 0]
+
+    def confirmed_tracks(self):
+        return [track for track in self.visible_tracks() if track.hits >= self.min_hits]
+
+    def stats(self):
+        frames = self.detections_run + self.frames_propagated
+        return {
+            "detections_run": self.detections_run,
+            "frames_propagated": self.frames_propagated,
+            "detector_ratio": round(self.detections_run / frames, 3) if frames else 0.0,
+            "tracks_created": self.next_id - 1,
+        }
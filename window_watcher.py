@@ -0,0 +1,156 @@
+import itertools
+import queue
+import threading
+import time
+
+
+class PyGetWindowBackend:
+    def __init__(self):
+        import pygetwindow  # Only available on desktops with a window manager
+        self.gw = pygetwindow
+
+    def state(self, title):
+        # "active", "inactive" (minimized or in the background) or "closed"
+        windows = self.gw.getWindowsWithTitle(title)
+        if not windows:
+            return "closed"
+        window = windows[0]
+        return "inactive" if window.isMinimized or not window.isActive else "active"
+
+
+class FakeWindowBackend:
+    # Scripted window for Linux runs and tests: cycles through (seconds, state) steps,
+    # unless a state has been forced with set_state()
+    def __init__(self, timeline=((20.0, "active"), (5.0, "inactive"))):
+        self.timeline = list(timeline)
+        self.started_at = time.monotonic()
+        self.forced = None
+
+    def set_state(self, state):
+        self.forced = state
+
+    def state(self, title):
+        if self.forced is not None:
+            return self.forced
+        elapsed = (time.monotonic() - self.started_at) % sum(seconds for seconds, _ in self.timeline)
+        for end, (_, state) in zip(itertools.accumulate(seconds for seconds, _ in self.timeline), self.timeline):
+            if elapsed < end:
+                return state
+        return self.timeline[-1][1]
+
+
+window_backends = {"pygetwindow": PyGetWindowBackend, "fake": FakeWindowBackend}
+
+
+def make_window_backend(name):
+    if name not in window_backends:
+        raise ValueError(f"Unknown window backend: {name} (expected one of {', '.join(window_backends)})")
+    return window_backends[name]()
+
+
+class WindowWatcher:
+    # Polls the target window every `poll_interval` seconds and only acts on a change that
+    # has held for `debounce` seconds, so brief focus flicker does not restart the camera.
+    # on_start() and on_stop(reason) run in order on a dispatcher thread, so opening the
+    # camera or finalizing a report never delays the next poll. A focus change is acted
+    # on within about debounce + poll_interval seconds plus any action still running.
+    def __init__(self, backend, title, on_start, on_stop, poll_interval=0.5, debounce=1.0):
+        self.backend = backend
+        self.title = title
+        self.on_start = on_start
+        self.on_stop = on_stop
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.active = False  # Debounced state: is a session running
+        self.candidate = None  # Raw state that differs from the debounced one, and since when
+        self.candidate_since = None
+        self.stop_flag = threading.Event()
+        self.thread = None
+        self.actions = queue.Queue()
+        self.lock = threading.Lock()
+        self.polls = 0
+        self.poll_seconds = 0.0
+        self.starts = 0
+        self.stops = 0
+        self.max_reaction = 0.0
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)  # Started once all state exists
+        self.dispatcher.start()
+
+    def poll(self):
+        start = time.perf_counter()
+        state = self.backend.state(self.title)
+        now = time.monotonic()
+        with self.lock:
+            self.polls += 1
+            self.poll_seconds += time.perf_counter() - start
+        if (state == "active") == self.active:
+            self.candidate = None  # Back to the debounced state, the change was only a flicker
+            return
+        if self.candidate is None:
+            self.candidate_since = now
+        self.candidate = state  # Keep the newest reason, e.g. inactive -> closed
+        if now - self.candidate_since < self.debounce:
+            return
+
+        self.active = state == "active"
+        if self.active:
+            self.actions.put((self.on_start, (), self.candidate_since))
+        else:
+            self.actions.put((self.on_stop, (state,), self.candidate_since))
+        self.candidate = None
+
+    def dispatch(self):
+        while True:
+            action = self.actions.get()
+            try:
+                if action is None:
+                    return
+                callback, args, changed_at = action
+                with self.lock:
+                    self.max_reaction = max(self.max_reaction, time.monotonic() - changed_at)
+                    if callback is self.on_start:
+                        self.starts += 1
+                    else:
+                        self.stops += 1
+                callback(*args)
+            except Exception as e:
+                print(f"Window watcher action failed: {e}")
+            finally:
+                self.actions.task_done()
+
+    def run(self):
+        # Blocks until stop() is called, e.g. from another thread or a signal handler
+        while not self.stop_flag.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Window check failed: {e}")
+            self.stop_flag.wait(self.poll_interval)
+
+    def start(self):
+        self.stop_flag.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def request_stop(self):
+        # Ends run() from any thread, including on_start/on_stop; the caller of run() then calls stop()
+        self.stop_flag.set()
+
+    def stop(self, timeout=10.0):
+        # Stop polling and wait for the queued start/stop actions to finish
+        self.stop_flag.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+        self.actions.put(None)
+        self.dispatcher.join(timeout=timeout)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "polls": self.polls,
+                "average_poll_ms": round(1000 * self.poll_seconds / self.polls, 2) if self.polls else 0.0,
+                "starts": self.starts,
+                "stops": self.stops,
+                "pending_actions": self.actions.qsize(),
+                "max_reaction_ms": round(1000 * self.max_reaction, 1),
+            }